@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Async Poster for Erosion Broadcaster
+Posts many threads, and to many accounts, concurrently. Replies inside a
+thread stay in order, and a thread that fails part-way resumes where it
+stopped instead of reposting from the start.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from state_store import write_atomic
+from twitter_integration import DuplicateTweetError, ForbiddenError, RateLimitError
+
+
+class AsyncTwitterBackend:
+    """Async counterpart of TwitterBackend"""
+    async def create_tweet(self, text: str, in_reply_to_tweet_id: Optional[str] = None) -> Optional[str]:
+        raise NotImplementedError
+
+    async def close(self):
+        """Release pooled connections"""
+
+
+class AsyncTweepyBackend(AsyncTwitterBackend):
+    def __init__(self, api_key, api_secret, access_token, access_secret):
+        """
+        Twitter API v2 through tweepy's AsyncClient
+
+        The client keeps one aiohttp session for all requests, so
+        connections are pooled. Needs `pip install "tweepy[async]"`.
+        """
+        import tweepy
+        from tweepy.asynchronous import AsyncClient
+        self.errors = tweepy.errors
+        self.client = AsyncClient(
+            consumer_key=api_key,
+            consumer_secret=api_secret,
+            access_token=access_token,
+            access_token_secret=access_secret
+        )
+
+    @classmethod
+    def from_env(cls, prefix: str = "TWITTER_"):
+        """Build from <prefix>API_KEY, <prefix>API_SECRET, ... environment variables"""
+        return cls(
+            os.environ[f"{prefix}API_KEY"],
+            os.environ[f"{prefix}API_SECRET"],
+            os.environ[f"{prefix}ACCESS_TOKEN"],
+            os.environ[f"{prefix}ACCESS_SECRET"]
+        )
+
+    async def create_tweet(self, text: str, in_reply_to_tweet_id: Optional[str] = None) -> Optional[str]:
+        try:
+            response = await self.client.create_tweet(text=text, in_reply_to_tweet_id=in_reply_to_tweet_id)
+        except self.errors.TooManyRequests as e:
+            reset = e.response.headers.get("x-rate-limit-reset") if e.response is not None else None
+            raise RateLimitError(str(e), reset_at=float(reset) if reset else None) from e
+        except self.errors.Forbidden as e:
+            if "duplicate" in str(e).lower():
+                raise DuplicateTweetError(str(e)) from e
+            raise ForbiddenError(str(e)) from e
+
+        if response and response.data:
+            return response.data['id']
+        return None
+
+    async def close(self):
+        session = getattr(self.client, "session", None)
+        if session is not None and not session.closed:
+            await session.close()
+
+
+class ThreadState:
+    def __init__(self, path):
+        """Tweet IDs already posted for each thread, persisted after every tweet"""
+        self.path = Path(path)
+        self.threads = {}
+        self._dirty = False
+        self._lock = None
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                self.threads = json.load(f)
+
+    @staticmethod
+    def key_for(account: str, tweets: List[str]) -> str:
+        """Stable key for a thread when the caller doesn't supply one"""
+        digest = hashlib.sha1("\x1e".join(tweets).encode()).hexdigest()[:16]
+        return f"{account}:{digest}"
+
+    def posted(self, key: str) -> List[str]:
+        return list(self.threads.get(key, {}).get("ids", []))
+
+    def record(self, key: str, account: str, tweet_id: str, total: int):
+        """Note a posted tweet in memory; flush() persists it"""
+        thread = self.threads.setdefault(key, {"account": account, "ids": []})
+        thread["ids"].append(tweet_id)
+        thread["complete"] = len(thread["ids"]) >= total
+        self._dirty = True
+
+    async def flush(self):
+        """
+        Save off the event loop, one write at a time
+
+        Threads that record while a write is in progress share the next
+        write instead of queueing one each.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            # Serialized here, on the loop, so the worker never sees the dict change
+            await asyncio.to_thread(write_atomic, self.path, json.dumps(self.threads, indent=2))
+
+    def save(self):
+        """Atomic write, so a crash never leaves half a state file"""
+        write_atomic(self.path, json.dumps(self.threads, indent=2))
+        self._dirty = False
+
+
+class AsyncThreadPoster:
+    def __init__(self, backends: Dict[str, AsyncTwitterBackend], state_file=".thread_state.json",
+                 max_concurrency: int = 8, per_account_concurrency: int = 4,
+                 max_wait: float = 900.0, base_delay: float = 2.0, max_delay: float = 300.0,
+                 max_attempts: int = 8, now=time.time, sleep=asyncio.sleep, rng=None):
+        """
+        Args:
+            backends: One backend per account name
+            state_file: Where partial-thread progress is kept
+            max_concurrency: Threads in flight across all accounts
+            per_account_concurrency: Threads in flight for any one account
+            max_wait, base_delay, max_delay, max_attempts: Rate-limit handling,
+                as in OutboxScheduler
+            now, sleep: Clock hooks; sleep is awaited
+        """
+        self.backends = backends
+        self.state = ThreadState(state_file)
+        self.max_concurrency = max_concurrency
+        self.per_account_concurrency = per_account_concurrency
+        self.max_wait = max_wait
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.now = now
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _create(self, backend: AsyncTwitterBackend, key: str, text: str,
+                      in_reply_to_tweet_id: Optional[str]) -> Optional[str]:
+        """One tweet, waiting out rate limits until max_wait or max_attempts says give up"""
+        attempt = 0
+        while True:
+            try:
+                return await backend.create_tweet(text, in_reply_to_tweet_id=in_reply_to_tweet_id)
+            except RateLimitError as e:
+                attempt += 1
+                # Respect the API's reset time; fall back to backoff if it gave none
+                wait = max(e.reset_at - self.now() if e.reset_at else self.backoff(attempt), 0)
+                if attempt >= self.max_attempts or wait > self.max_wait:
+                    # The progress so far is saved, so a later run resumes here
+                    raise
+                print(f"⚠ Thread {key} rate limited, waiting {wait:.0f}s")
+                await self.sleep(wait + self.rng.uniform(0, 1))
+
+    async def post_thread(self, account: str, tweets: List[str], key: Optional[str] = None) -> List[str]:
+        """
+        Post one thread in order, skipping tweets that an earlier attempt
+        already posted; returns every tweet ID in the thread
+        """
+        key = key or ThreadState.key_for(account, tweets)
+        backend = self.backends[account]
+        ids = self.state.posted(key)
+
+        if ids:
+            print(f"↻ Resuming thread {key} at tweet {len(ids) + 1}/{len(tweets)}")
+
+        for i in range(len(ids), len(tweets)):
+            # Each reply needs the previous tweet's ID, so this part stays sequential
+            tweet_id = await self._create(backend, key, tweets[i], ids[-1] if ids else None)
+            if not tweet_id:
+                raise RuntimeError(f"thread tweet {i + 1} returned no ID")
+            ids.append(tweet_id)
+            self.state.record(key, account, tweet_id, len(tweets))
+            # Saved before the next reply goes out, or a crash could repost it
+            await self.state.flush()
+            print(f"✓ Thread {key} tweet {i + 1}/{len(tweets)} posted")
+
+        return ids
+
+    async def post_threads(self, jobs: List[dict]) -> Dict[str, object]:
+        """
+        Post independent threads concurrently
+
+        Args:
+            jobs: [{"account": ..., "tweets": [...], "key": optional}, ...]
+
+        Returns:
+            key -> list of tweet IDs, or the exception that stopped that thread
+        """
+        overall = asyncio.Semaphore(self.max_concurrency)
+        per_account = {name: asyncio.Semaphore(self.per_account_concurrency) for name in self.backends}
+
+        async def run(job):
+            async with overall, per_account[job["account"]]:
+                return await self.post_thread(job["account"], job["tweets"], job["key"])
+
+        for job in jobs:
+            job.setdefault("key", None)
+            job["key"] = job["key"] or ThreadState.key_for(job["account"], job["tweets"])
+
+        results = await asyncio.gather(*(run(job) for job in jobs), return_exceptions=True)
+        return {job["key"]: result for job, result in zip(jobs, results)}
+
+    async def close(self):
+        await asyncio.gather(*(backend.close() for backend in self.backends.values()))
+
+    def run(self, jobs: List[dict]) -> Dict[str, object]:
+        """Blocking entry point: post every job, then close the sessions"""
+        async def main():
+            try:
+                return await self.post_threads(jobs)
+            finally:
+                await self.close()
+        return asyncio.run(main())
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for Erosion Broadcaster
+Builds a synthetic eroding repository offline and times the broadcaster's
+hot paths against it, so runs can be compared and regressions caught.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from broadcast import ErosionBroadcaster
+from async_poster import AsyncThreadPoster
+from fake_servers import FakeBlueskyServer, FakeMastodonServer
+from fake_twitter import AsyncFakeTwitterBackend, FakeClock, FakeTwitterBackend
+from outbox import Outbox
+from publishers import ArchivePoster, BlueskyPoster, Destination, MastodonPoster, Publisher
+from snippet_cache import SnippetCache
+from static_archive import StaticArchive
+from twitter_integration import TwitterPoster
+
+# Corruption characters the real erosion process scatters through its code
+CORRUPTION_CHARS = "#*~`"
+
+# Decay levels by fraction of characters corrupted since the last restoration
+DECAY_LEVELS = [
+    (0.002, "minimal"),
+    (0.01, "slight"),
+    (0.03, "moderate"),
+    (0.08, "severe"),
+    (1.0, "critical"),
+]
+
+SOURCE_TEMPLATE = [
+    "def save_state(self):",
+    "    with open(self.state_file, 'w') as f:",
+    "        json.dump(self.state, f, indent=2)",
+    "",
+    "    else:",
+    "        self.iteration = 0",
+    "    chars = list(line)",
+    "    for i in range(len(chars)):",
+    "        chars[i] = random.choice('_~*`')",
+    "# {timestamp}",
+    "    return ''.join(chars)",
+]
+
+
+def generate_source(lines, rng):
+    """Plausible erosion.py text of roughly the requested line count"""
+    out = []
+    while len(out) < lines:
+        for template in SOURCE_TEMPLATE:
+            out.append(template.format(timestamp=f"{rng.randint(2000, 2099)}-01-01"))
+    return "\n".join(out[:lines]) + "\n"
+
+
+def decay_level(fraction):
+    for limit, name in DECAY_LEVELS:
+        if fraction <= limit:
+            return name
+    return "critical"
+
+
+def build_synthetic_repo(path, commits=500, file_lines=400, corruption_rate=0.002,
+                         restoration_every=100, seed=0):
+    """
+    Create a git repo at path whose erosion.py decays commit by commit
+
+    Each commit corrupts about corruption_rate of the file's characters and
+    every restoration_every-th commit restores the pristine file. History is
+    written in one `git fast-import` stream so large repos build quickly.
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    subprocess.run(["git", "init", "-q", "-b", "main", str(path)], check=True)
+    # Let partial/shallow clones of the synthetic repo behave like GitHub
+    subprocess.run(["git", "config", "uploadpack.allowFilter", "true"], cwd=path, check=True)
+
+    pristine = generate_source(file_lines, rng)
+    chars = list(pristine)
+    corrupted = 0
+    stream = io.BytesIO()
+    timestamp = 1700000000
+
+    def data(payload):
+        encoded = payload.encode()
+        stream.write(f"data {len(encoded)}\n".encode())
+        stream.write(encoded + b"\n")
+
+    for iteration in range(1, commits + 1):
+        if restoration_every and iteration % restoration_every == 0:
+            chars = list(pristine)
+            corrupted = 0
+            message = f"☽ RESTORATION ☾ iteration {iteration}: the code remembers itself"
+        else:
+            mutations = max(1, int(len(chars) * corruption_rate))
+            for _ in range(mutations):
+                index = rng.randrange(len(chars))
+                if chars[index] != "\n":
+                    chars[index] = rng.choice(CORRUPTION_CHARS)
+            corrupted += mutations
+            level = decay_level(corrupted / len(chars))
+            message = f"iteration {iteration}: {level} erosion ({mutations} mutations)"
+
+        timestamp += 3600
+        stream.write(b"commit refs/heads/main\n")
+        stream.write(f"mark :{iteration}\n".encode())
+        stream.write(f"committer Digital Erosion <erosion@example.com> {timestamp} +0000\n".encode())
+        data(message)
+        if iteration > 1:
+            stream.write(f"from :{iteration - 1}\n".encode())
+        stream.write(b"M 100644 inline erosion.py\n")
+        data("".join(chars))
+
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=path, input=stream.getvalue(),
+                   check=True)
+    subprocess.run(["git", "checkout", "-q", "main"], cwd=path, check=True)
+    return path
+
+
+def time_it(fn, repeat, setup=None):
+    """Run fn repeat times and collect wall-clock durations"""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return {
+        "median": statistics.median(runs),
+        "min": min(runs),
+        "max": max(runs),
+        "runs": len(runs),
+    }
+
+
+def run_benchmarks(workdir, args):
+    """Time each stage of the broadcaster against a fresh synthetic repo"""
+    workdir = Path(workdir)
+    origin = build_synthetic_repo(
+        workdir / "origin",
+        commits=args.commits,
+        file_lines=args.file_lines,
+        corruption_rate=args.corruption_rate,
+        restoration_every=args.restoration_every,
+        seed=args.seed,
+    )
+    clone = workdir / "clone"
+    subprocess.run(["git", "clone", "-q", str(origin), str(clone)], check=True)
+
+    broadcaster = ErosionBroadcaster(
+        connect_twitter=False,
+        erosion_repo=origin.resolve().as_uri(),
+        local_erosion_path=clone,
+        state_file=workdir / "state.json",
+    )
+    cache_file = workdir / ".snippet_cache.json"
+    sample = list(broadcaster.git.iter_log(max_count=args.sample))
+    hashes = [commit["hash"] for commit in sample]
+
+    def cold_cache():
+        cache_file.unlink(missing_ok=True)
+        broadcaster.snippet_cache = SnippetCache(cache_file)
+        broadcaster.diffs.cache = broadcaster.snippet_cache
+
+    def reset_state():
+        broadcaster.state = broadcaster.initial_state()
+        cold_cache()
+
+    def dry_run_broadcast():
+        with contextlib.redirect_stdout(io.StringIO()):
+            broadcaster.broadcast(dry_run=True)
+
+    def replay():
+        with contextlib.redirect_stdout(io.StringIO()):
+            broadcaster.replay(f"{hashes[-1]}..HEAD", workdir / "replay.jsonl", workers=1)
+
+    results = {}
+    results["get_recent_commits"] = time_it(
+        lambda: broadcaster.get_recent_commits(limit=20), args.repeat)
+    results["iter_pending_commits_full_history"] = time_it(
+        lambda: sum(1 for _ in broadcaster.iter_pending_commits()), args.repeat, reset_state)
+    results["get_corrupted_snippet_cold"] = time_it(
+        lambda: [broadcaster.get_corrupted_snippet(h) for h in hashes], args.repeat, cold_cache)
+    results["get_corrupted_snippet_warm"] = time_it(
+        lambda: [broadcaster.get_corrupted_snippet(h) for h in hashes], args.repeat)
+    results["get_diff_snippet_cold"] = time_it(
+        lambda: [broadcaster.get_diff_snippet(h) for h in hashes], args.repeat, cold_cache)
+    results["get_diff_snippet_warm"] = time_it(
+        lambda: [broadcaster.get_diff_snippet(h) for h in hashes], args.repeat)
+    results["diff_changes_batch_cold"] = time_it(
+        lambda: sum(1 for _ in broadcaster.diffs.iter_commit_changes(hashes)), args.repeat, cold_cache)
+    results["generate_tweet_warm"] = time_it(
+        lambda: [broadcaster.generate_tweet(c) for c in sample], args.repeat)
+    def drop_index():
+        broadcaster.index.close()
+        broadcaster.index.path.unlink(missing_ok=True)
+
+    # A full build scans every blob once; later runs only add new commits
+    results["corruption_index_build"] = time_it(
+        lambda: broadcaster.index.update(broadcaster.git, broadcaster.scanner), 1, drop_index)
+    results["corruption_index_queries"] = time_it(
+        lambda: [(broadcaster.index.most_corrupted_line(until=h),
+                  broadcaster.index.fastest_decaying_functions(h)) for h in hashes], args.repeat)
+    results["blob_stats_cold"] = time_it(
+        lambda: [broadcaster.get_blob_stats(h) for h in hashes], args.repeat, cold_cache)
+    def drop_archive():
+        shutil.rmtree(workdir / "archive", ignore_errors=True)
+
+    def build_archive():
+        with contextlib.redirect_stdout(io.StringIO()):
+            StaticArchive(broadcaster, workdir / "archive").build()
+
+    # Every commit in the history, then a rebuild with nothing new to write
+    results["archive_full_build"] = time_it(build_archive, 1, drop_archive)
+    results["archive_noop_rebuild"] = time_it(build_archive, args.repeat)
+    results["broadcast_dry_run"] = time_it(dry_run_broadcast, args.repeat, reset_state)
+    results["replay_sample"] = time_it(replay, args.repeat, cold_cache)
+
+    # Leave a warm snippet cache behind for the startup benchmarks
+    for h in hashes:
+        broadcaster.get_corrupted_snippet(h)
+    broadcaster.snippet_cache.save()
+    broadcaster.git.close()
+
+    results.update(run_posting_benchmarks(args))
+    results.update(run_startup_benchmarks(workdir, clone, args))
+    return results
+
+
+STARTUP_SCRIPT = """
+import sys, time
+started = time.perf_counter()
+sys.path.insert(0, {repo!r})
+from broadcast import ErosionBroadcaster
+broadcaster = ErosionBroadcaster(connect_twitter={connect}, local_erosion_path={clone!r},
+                                 state_file={state!r})
+{extra}
+print(time.perf_counter() - started, 'tweepy' in sys.modules)
+"""
+
+
+def run_startup_benchmarks(workdir, clone, args):
+    """Time import + construction in a fresh interpreter, as a CLI run would see it"""
+    repo = str(Path(__file__).resolve().parent)
+    scenarios = {
+        # What `python broadcast.py` does before its first git call
+        "startup_dry_run": dict(connect=True, extra=""),
+        # Replay builds an offline broadcaster
+        "startup_replay": dict(connect=False, extra=""),
+        # Startup plus one snippet served from the warm cache
+        "startup_cache_warm": dict(
+            connect=True,
+            extra="broadcaster.get_corrupted_snippet(broadcaster.git.iter_log(max_count=1).__next__()['hash'])"
+        ),
+    }
+
+    results = {}
+    for name, scenario in scenarios.items():
+        script = STARTUP_SCRIPT.format(repo=repo, clone=str(clone),
+                                       state=str(Path(workdir) / "state.json"), **scenario)
+        runs = []
+        imported_tweepy = False
+        for _ in range(args.repeat):
+            result = subprocess.run([sys.executable, "-c", script], capture_output=True,
+                                    text=True, check=True)
+            elapsed, tweepy_loaded = result.stdout.split()[-2:]
+            runs.append(float(elapsed))
+            imported_tweepy |= tweepy_loaded == "True"
+        results[name] = {
+            "median": statistics.median(runs),
+            "min": min(runs),
+            "max": max(runs),
+            "runs": len(runs),
+            "imported_tweepy": imported_tweepy,
+        }
+    return results
+
+
+def run_posting_benchmarks(args):
+    """Drive the posting path through the fake Twitter backend on simulated time"""
+    results = {}
+    stats = {}
+
+    def post_many():
+        backend = FakeTwitterBackend(latency=args.post_latency, clock=FakeClock(),
+                                     rate_limit=args.rate_limit)
+        with contextlib.redirect_stdout(io.StringIO()):
+            poster = TwitterPoster(backend=backend)
+            posted = sum(1 for i in range(args.posts)
+                         if poster.post_tweet(f"iteration {i}: synthetic decay"))
+        stats.update(posted=posted, rate_limited=backend.rate_limited,
+                     simulated_seconds=backend.clock.time() - 1_700_000_000.0)
+
+    def post_threads():
+        backend = FakeTwitterBackend(latency=args.post_latency, clock=FakeClock())
+        with contextlib.redirect_stdout(io.StringIO()):
+            poster = TwitterPoster(backend=backend)
+            for thread in range(10):
+                poster.post_thread([f"thread {thread} part {i}" for i in range(12)])
+
+    def threads_sequential():
+        backend = FakeTwitterBackend(latency=args.thread_latency)
+        with contextlib.redirect_stdout(io.StringIO()):
+            poster = TwitterPoster(backend=backend)
+            for thread in range(10):
+                poster.post_thread([f"thread {thread} part {i}" for i in range(12)])
+
+    def threads_async():
+        state_file = Path(tempfile.mkdtemp(prefix="erosion-threads-")) / "threads.json"
+        accounts = {f"account{n}": AsyncFakeTwitterBackend(latency=args.thread_latency)
+                    for n in range(2)}
+        jobs = [{"account": f"account{thread % 2}",
+                 "tweets": [f"thread {thread} part {i}" for i in range(12)]}
+                for thread in range(10)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            AsyncThreadPoster(accounts, state_file=state_file, per_account_concurrency=5).run(jobs)
+        shutil.rmtree(state_file.parent, ignore_errors=True)
+
+    def fan_out(concurrent):
+        # Mastodon is slow here; the other destinations shouldn't wait for it
+        workdir = Path(tempfile.mkdtemp(prefix="erosion-fanout-"))
+        mastodon = FakeMastodonServer(latency=args.thread_latency * 4).start()
+        bluesky = FakeBlueskyServer(latency=args.thread_latency).start()
+        destinations = [
+            Destination("twitter", TwitterPoster(backend=FakeTwitterBackend(latency=args.thread_latency)), 280, None),
+            Destination("mastodon", MastodonPoster(mastodon.url, mastodon.token), 500, None),
+            Destination("bluesky", BlueskyPoster(bluesky.url, bluesky.handle, bluesky.password), 300, None),
+            Destination("archive", ArchivePoster(workdir / "archive.jsonl"), None, None),
+        ]
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for d in destinations:
+                    # Authenticate up front; only posting is timed below
+                    d.poster.connected
+                publisher = Publisher(destinations, {d.name: Outbox(workdir / f"{d.name}.jsonl")
+                                                     for d in destinations})
+                for i in range(10):
+                    publisher.enqueue(f"{i:040x}", f"iteration {i}: synthetic decay")
+                started = time.perf_counter()
+                if concurrent:
+                    publisher.flush()
+                else:
+                    for d in destinations:
+                        Publisher([d], publisher.outboxes).flush()
+                return time.perf_counter() - started
+        finally:
+            mastodon.stop()
+            bluesky.stop()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def time_fan_out(concurrent):
+        times = [fan_out(concurrent) for _ in range(args.repeat)]
+        return {"median": statistics.median(times), "min": min(times), "max": max(times), "runs": len(times)}
+
+    results["fake_post_tweets"] = time_it(post_many, args.repeat)
+    # Throughput the API would allow, measured on the fake clock
+    results["fake_post_tweets"].update(stats)
+    results["fake_post_threads_10x12"] = time_it(post_threads, args.repeat)
+    # Real (small) latency, so concurrency shows up in wall-clock time
+    results["threads_sequential_10x12"] = time_it(threads_sequential, args.repeat)
+    results["threads_async_10x12"] = time_it(threads_async, args.repeat)
+    # Four destinations, ten posts each: one after another vs. all at once
+    results["fanout_sequential_4x10"] = time_fan_out(False)
+    results["fanout_concurrent_4x10"] = time_fan_out(True)
+    return results
+
+
+def git_version():
+    result = subprocess.run(["git", "--version"], capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table; return the names that got slower than threshold allows"""
+    regressions = []
+    print(f"\n{'benchmark':<36} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<36} {'-':>10} {current['min']:>10.4f} {'new':>8}")
+            continue
+        # Best-of-N is far less noisy than the median for short timings
+        change = current["min"] / before["min"] - 1 if before["min"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  ⚠ regression"
+        print(f"{name:<36} {before['min']:>10.4f} {current['min']:>10.4f} "
+              f"{change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the erosion broadcaster offline")
+    parser.add_argument("--commits", type=int, default=500,
+                        help="commits in the synthetic repo")
+    parser.add_argument("--file-lines", type=int, default=400,
+                        help="lines in the synthetic erosion.py")
+    parser.add_argument("--corruption-rate", type=float, default=0.002,
+                        help="fraction of characters corrupted per commit")
+    parser.add_argument("--restoration-every", type=int, default=100,
+                        help="commits between RESTORATION events (0 disables)")
+    parser.add_argument("--sample", type=int, default=50,
+                        help="commits used by the per-commit benchmarks")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for the synthetic history")
+    parser.add_argument("--posts", type=int, default=2000,
+                        help="tweets pushed through the fake Twitter backend")
+    parser.add_argument("--post-latency", type=float, default=0.25,
+                        help="simulated seconds per fake API request")
+    parser.add_argument("--thread-latency", type=float, default=0.005,
+                        help="real seconds per request in the thread-posting benchmarks")
+    parser.add_argument("--rate-limit", type=int, default=200,
+                        help="fake API requests allowed per 15-minute window")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="where to write machine-readable results")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="results file from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown (as a fraction) that counts as a regression")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the synthetic repo's temporary directory")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="erosion-bench-")
+    try:
+        results = run_benchmarks(workdir, args)
+    finally:
+        if args.keep:
+            print(f"Synthetic repo kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "git": git_version(),
+            "params": {k: v for k, v in vars(args).items()
+                       if k not in ("output", "compare", "keep")},
+        },
+        "results": results,
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        print(f"{name:<36} median {result['median']:.4f}s  min {result['min']:.4f}s")
+    print(f"\n✓ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Blob Statistics for Erosion Broadcaster
+Quantitative decay measures over the raw bytes of a blob: per-line
+corruption histogram, byte entropy, and sparklines. Uses NumPy when it is
+installed (`pip install numpy`) and falls back to the standard library.
+NumPy is imported on first use, so runs that never compute stats don't
+pay for it at startup.
+"""
+
+import math
+from collections import namedtuple
+from typing import List, Sequence
+
+# numpy module once imported, None if unavailable, False until first use
+_np = False
+
+# Bytes that erosion leaves behind
+MARKER_BYTES = b"#*~`"
+
+# Lower edges of the histogram buckets for markers per corrupted line:
+# 1, 2, 3, 4-5, 6-7, 8-11, 12-15, 16+
+BUCKET_EDGES = (1, 2, 3, 4, 6, 8, 12, 16)
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+# Bytes counted per bincount call, bounding its int64 scratch copy to 32 MiB
+COUNT_SLICE = 1 << 22
+
+BlobStats = namedtuple("BlobStats", ["size", "lines", "marked_lines", "entropy", "histogram"])
+
+
+def _numpy():
+    global _np
+    if _np is False:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = None
+    return _np
+
+
+def compute(data: bytes) -> BlobStats:
+    """All statistics for one blob in a single vectorized pass"""
+    if _numpy() is not None:
+        return _compute_numpy(data)
+    return _compute_python(data)
+
+
+def _compute_numpy(data: bytes) -> BlobStats:
+    np = _np
+    arr = np.frombuffer(data, dtype=np.uint8)
+    if arr.size == 0:
+        return BlobStats(0, 0, 0, 0.0, [0] * len(BUCKET_EDGES))
+
+    # bincount widens its input to int64, so count a slice at a time
+    counts = np.zeros(256, dtype=np.int64)
+    for start in range(0, arr.size, COUNT_SLICE):
+        counts += np.bincount(arr[start:start + COUNT_SLICE], minlength=256)
+    p = counts[counts > 0] / arr.size
+    entropy = float(-(p * np.log2(p)).sum())
+
+    # Line number of every marker byte (newlines before it), then markers per line;
+    # only positions are materialized, never a per-byte array wider than a bool
+    newline_pos = np.flatnonzero(arr == 10)
+    lines = newline_pos.size + 1 - int(arr[-1] == 10)
+    is_marker = arr == MARKER_BYTES[0]
+    for marker in MARKER_BYTES[1:]:
+        is_marker |= arr == marker
+    marker_pos = np.flatnonzero(is_marker)
+    per_line = np.bincount(np.searchsorted(newline_pos, marker_pos), minlength=lines)
+
+    marked = per_line[per_line > 0]
+    buckets = np.searchsorted(np.array(BUCKET_EDGES), marked, side="right") - 1
+    histogram = np.bincount(buckets, minlength=len(BUCKET_EDGES))
+
+    return BlobStats(int(arr.size), lines, int(marked.size), round(entropy, 6),
+                     [int(n) for n in histogram])
+
+
+def _compute_python(data: bytes) -> BlobStats:
+    if not data:
+        return BlobStats(0, 0, 0, 0.0, [0] * len(BUCKET_EDGES))
+
+    size = len(data)
+    entropy = 0.0
+    for byte in set(data):
+        p = data.count(byte) / size
+        entropy -= p * math.log2(p)
+
+    histogram = [0] * len(BUCKET_EDGES)
+    lines = data.split(b"\n")
+    marked_lines = 0
+    for line in lines:
+        # bytes.count runs in C; the loop is over lines, not characters
+        n = sum(line.count(marker) for marker in (b"#", b"*", b"~", b"`"))
+        if n:
+            marked_lines += 1
+            bucket = 0
+            while bucket + 1 < len(BUCKET_EDGES) and n >= BUCKET_EDGES[bucket + 1]:
+                bucket += 1
+            histogram[bucket] += 1
+
+    # A trailing newline doesn't start another line
+    line_count = len(lines) - (1 if data.endswith(b"\n") else 0)
+    return BlobStats(size, line_count, marked_lines, round(entropy, 6), histogram)
+
+
+def sparkline(values: Sequence[float]) -> str:
+    """Scale values onto ▁..█, lowest to highest"""
+    if not len(values):
+        return ""
+    np = _numpy()
+    if np is not None:
+        arr = np.asarray(values, dtype=float)
+        low, span = arr.min(), arr.max() - arr.min()
+        if span == 0:
+            return SPARK_CHARS[0] * arr.size
+        levels = ((arr - low) / span * (len(SPARK_CHARS) - 1)).round().astype(int)
+        return "".join(SPARK_CHARS[i] for i in levels)
+
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return "".join(SPARK_CHARS[int(round((v - low) * scale))] for v in values)
+
+
+def histogram_bar(histogram: List[int]) -> str:
+    """The per-line corruption histogram as a sparkline; blank where a bucket is empty"""
+    if not any(histogram):
+        return ""
+    peak = max(histogram)
+    return "".join(SPARK_CHARS[min(len(SPARK_CHARS) - 1, (n * len(SPARK_CHARS) - 1) // peak)] if n else " "
+                   for n in histogram)
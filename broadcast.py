@@ -8,144 +8,398 @@ import os
 import json
 import random
 import subprocess
+import time
 from datetime import datetime
 from pathlib import Path
 import re
+from itertools import islice
+import blob_stats
+from corruption_index import CorruptionIndex
+from corruption_scanner import CandidateSpan, CorruptionScanner
+from diff_engine import DiffEngine
+from git_reader import GitObjectReader
+from metrics import METRICS
+from outbox import Outbox
+from pipeline import CandidatePipeline
+from publishers import Destination, Publisher, destinations_from_env
+from snippet_cache import SnippetCache
+from state_store import StateStore
 from twitter_integration import TwitterPoster
 
 class ErosionBroadcaster:
-    def __init__(self):
-        self.erosion_repo = "https://github.com/closestfriend/digital-erosion.git"
-        self.local_erosion_path = Path("./erosion_clone")
-        self.state_file = Path(".broadcaster_state.json")
-        self.twitter = TwitterPoster()
+    # How far back to look when there is no usable last_tweeted_commit cursor
+    RESCAN_LIMIT = 200
+    # History depth fetched by a shallow sync, and how often to deepen it
+    SYNC_DEPTH = 50
+    MAX_DEEPEN_ATTEMPTS = 5
+    # Tweets picked per run, best first, from everything pending
+    TWEETS_PER_RUN = 1
+    # Iterations shown in decay-trend sparklines
+    TREND_LENGTH = 20
+    # erosion.py blobs larger than this are sampled from a byte stream instead of scanned whole
+    STREAM_THRESHOLD = 4 * 1024 * 1024
+    
+    def __init__(self, connect_twitter=True, erosion_repo=None, local_erosion_path=None,
+                 state_file=None, twitter_backend=None, mirrors=None):
+        self.erosion_repo = erosion_repo or "https://github.com/closestfriend/digital-erosion.git"
+        self.local_erosion_path = Path(local_erosion_path or "./erosion_clone")
+        self.state_file = Path(state_file or ".broadcaster_state.json")
+        # "shallow" = blobless, depth-limited clone; "full" = plain clone/pull
+        self.sync_mode = "shallow"
+        # Fetch and index the whole history, so history-based styles can render (--backfill-index)
+        self.backfill_index = False
+        self.git = GitObjectReader(self.local_erosion_path)
+        self.scanner = CorruptionScanner()
+        # Blob analysis lives next to the state file, keyed by blob SHA
+        self.snippet_cache = SnippetCache(self.state_file.with_name(".snippet_cache.json"))
+        self.diffs = DiffEngine(self.git, self.snippet_cache)
+        # Most bytes of any one erosion.py blob that are ever scanned
+        self.max_scan_bytes = int(os.environ.get("EROSION_MAX_SCAN_BYTES", 64 * 1024 * 1024))
+        # Corruption at every commit, for questions about the whole history
+        self.index = CorruptionIndex(self.state_file.with_name(".corruption_index.sqlite"),
+                                     max_blob_bytes=self.max_scan_bytes)
+        # Mixed into every per-commit seed; change it to get a fresh set of renderings
+        self.seed_salt = os.environ.get("EROSION_SEED_SALT", "")
+        # Rendered tweets wait here until the API accepts them
+        self.outbox = Outbox(self.state_file.with_name(".broadcaster_outbox.jsonl"))
+        # Destinations besides Twitter (publishers.Destination); None reads them from the environment
+        self.mirrors = mirrors
+        self.publisher = None
+        # Offline modes (replay) never need the Twitter API
+        self.twitter = TwitterPoster(backend=twitter_backend) if connect_twitter else None
+        # Atomic state snapshot plus a journal of every commit ever tweeted
+        self.store = StateStore(self.state_file)
+        # Keep git pipes and the index connection open between runs (--watch)
+        self.keep_open = False
         self.load_state()
         
+    @staticmethod
+    def initial_state():
+        """State of a broadcaster that has never tweeted"""
+        return {
+            "last_tweeted_commit": None,
+            "total_tweets": 0,
+            "last_restoration": None
+        }
+    
     def load_state(self):
         """Load the last known state of the broadcaster"""
-        if self.state_file.exists():
-            with open(self.state_file, 'r') as f:
-                self.state = json.load(f)
-        else:
-            self.state = {
-                "last_tweeted_commit": None,
-                "total_tweets": 0,
-                "last_restoration": None
-            }
+        self.state = self.store.load() or self.initial_state()
     
     def save_state(self):
-        """Save the current state"""
-        with open(self.state_file, 'w') as f:
-            json.dump(self.state, f, indent=2)
+        """Save the current state (write-and-rename, so a crash can't corrupt it)"""
+        self.store.save(self.state)
     
     def clone_or_pull_erosion(self):
         """Get the latest erosion repository state"""
-        if not self.local_erosion_path.exists():
-            subprocess.run(["git", "clone", self.erosion_repo, str(self.local_erosion_path)], 
-                         capture_output=True)
+        started = time.monotonic()
+        
+        if self.sync_mode == "full":
+            METRICS.incr("subprocess_calls")
+            if not self.local_erosion_path.exists():
+                subprocess.run(["git", "clone", self.erosion_repo, str(self.local_erosion_path)], 
+                             capture_output=True)
+                action = "full clone"
+            else:
+                subprocess.run(["git", "pull"], cwd=self.local_erosion_path, capture_output=True)
+                action = "pull"
+        elif not (self.local_erosion_path / ".git").exists():
+            # Commits and trees only; blobs are fetched lazily as they are read
+            METRICS.incr("subprocess_calls")
+            subprocess.run(
+                ["git", "clone", "--filter=blob:none", f"--depth={self.SYNC_DEPTH}",
+                 "--single-branch", self.erosion_repo, str(self.local_erosion_path)],
+                capture_output=True
+            )
+            action = "shallow clone"
         else:
-            subprocess.run(["git", "pull"], cwd=self.local_erosion_path, capture_output=True)
+            self._fetch_fast_forward()
+            action = "fetch"
+        
+        if self.sync_mode != "full":
+            deepened = self._deepen_to_cursor()
+            if deepened:
+                action += f" + {deepened} deepen(s)"
+        
+        print(f"✓ Synced erosion repo via {action} in {time.monotonic() - started:.2f}s")
+    
+    def _git(self, *args):
+        """Run a one-off git command in the erosion clone"""
+        METRICS.incr("subprocess_calls")
+        return subprocess.run(["git", *args], cwd=self.local_erosion_path,
+                              capture_output=True, text=True)
+    
+    def _fetch_fast_forward(self):
+        """Reuse an existing clone: fetch, then move HEAD forward to the remote tip"""
+        self._git("fetch", "--filter=blob:none", "origin")
+        
+        if self._git("merge", "--ff-only", "FETCH_HEAD").returncode != 0:
+            # The erosion repo was force-pushed; mirror it rather than merge
+            print("⚠ Erosion history diverged, resetting clone to the remote tip")
+            self._git("reset", "--hard", "FETCH_HEAD")
+    
+    def _prefetch_blobs(self, revs="HEAD"):
+        """
+        Fetch the erosion.py blobs of revs (a rev-list range) that the
+        blobless clone is missing in one request, instead of one lazy
+        fetch per blob read
+        """
+        listing = self._git("rev-list", "--objects", "--missing=print", revs, "--", "erosion.py")
+        missing = [line[1:] for line in listing.stdout.splitlines() if line.startswith("?")]
+        if missing:
+            METRICS.incr("subprocess_calls")
+            subprocess.run(["git", "-c", "fetch.negotiationAlgorithm=noop", "fetch", "-q", "--no-tags",
+                            "--no-write-fetch-head", "--filter=blob:none", "--stdin", "origin"],
+                           cwd=self.local_erosion_path, input="\n".join(missing) + "\n",
+                           capture_output=True, text=True)
+        return len(missing)
+    
+    def _unindexed_revs(self):
+        """The commits the next index update will read, as a rev-list range"""
+        cursor = self.index.cursor
+        if cursor and self.git.is_ancestor(cursor, "HEAD"):
+            return f"{cursor}..HEAD"
+        return "HEAD"
+    
+    def _sync(self, backfill=False, reach=None):
+        """
+        Sync the clone, then fetch in one batch the blobs the index is
+        about to read: only the new commits, unless backfilling
+        
+        Backfilling fetches the whole history and re-indexes it from the
+        root once; after that the index stays complete incrementally.
+        reach is a commit the shallow clone is deepened to first.
+        """
+        self.clone_or_pull_erosion()
+        if reach and self.sync_mode != "full":
+            self._deepen_until_reachable(reach)
+        if backfill:
+            if self._git("rev-parse", "--is-shallow-repository").stdout.strip() == "true":
+                self._git("fetch", "--filter=blob:none", "--unshallow", "origin")
+            if not self.index.complete:
+                # Older commits are below the indexed ones; number them from the root again
+                self.index.reset_commits()
+        fetched = self._prefetch_blobs(self._unindexed_revs())
+        if fetched:
+            print(f"✓ Fetched {fetched} erosion.py blob(s) in one batch")
+    
+    def _deepen_to_cursor(self):
+        """Fetch more history until last_tweeted_commit is reachable again"""
+        cursor = self.state.get('last_tweeted_commit')
+        if not cursor:
+            return 0
+        return self._deepen_until_reachable(cursor)
+    
+    def _deepen_until_reachable(self, commit_hash):
+        """Deepen a shallow clone until commit_hash is in HEAD's history"""
+        attempts = 0
+        depth = self.SYNC_DEPTH
+        while not self.git.is_ancestor(commit_hash, "HEAD"):
+            if self._git("rev-parse", "--is-shallow-repository").stdout.strip() != "true":
+                # Full history is here and the commit still isn't in it
+                break
+            
+            attempts += 1
+            if attempts > self.MAX_DEEPEN_ATTEMPTS:
+                self._git("fetch", "--filter=blob:none", "--unshallow", "origin")
+                break
+            
+            self._git("fetch", "--filter=blob:none", f"--deepen={depth}", "origin")
+            depth *= 2
+        
+        return attempts
+    
+    def rng_for(self, commit_hash):
+        """Random source for one commit: same commit + salt, same tweet"""
+        return random.Random(f"{self.seed_salt}:{commit_hash}")
     
     def get_recent_commits(self, limit=10):
         """Get recent commit information"""
-        result = subprocess.run(
-            ["git", "log", f"--max-count={limit}", "--pretty=format:%H|%s|%ai"],
-            cwd=self.local_erosion_path,
-            capture_output=True,
-            text=True
-        )
-        
-        commits = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                hash_val, message, date = line.split('|')
-                commits.append({
-                    "hash": hash_val,
-                    "message": message,
-                    "date": date
-                })
-        return commits
-    
-    def get_corrupted_snippet(self, commit_hash):
+        return list(self.git.iter_log(max_count=limit))
+    
+    def iter_pending_commits(self):
+        """Stream commits newer than last_tweeted_commit, newest first"""
+        cursor = self.state.get('last_tweeted_commit')
+        
+        if cursor and self.git.is_ancestor(cursor, "HEAD"):
+            # Only ask git for what happened since the last tweet
+            yield from self.git.iter_log(f"{cursor}..HEAD")
+            return
+        
+        if cursor:
+            # History was rewritten or force-pushed under us
+            print(f"⚠ Last tweeted commit {cursor[:7]} is no longer in history, "
+                  f"rescanning the last {self.RESCAN_LIMIT} commits")
+        
+        yield from self.git.iter_log(max_count=self.RESCAN_LIMIT)
+    
+    def get_snippet_candidates(self, commit_hash):
+        """
+        Where the corrupted lines (and fallback lines) of erosion.py are at a
+        commit, cached by blob SHA
+        
+        Only offsets are cached, not the lines themselves; the chosen line is
+        cut from the blob when a snippet is rendered.
+        """
+        blob_sha = self.diffs.blob_id(commit_hash)
+        if blob_sha is None:
+            return None
+        
+        entry = self.snippet_cache.get_snippets(blob_sha)
+        if entry is not None:
+            return entry
+        
+        info = self.git.object_info(blob_sha)
+        if info is not None and info[2] > min(self.STREAM_THRESHOLD, self.max_scan_bytes):
+            # Too big to hold every line; get_corrupted_snippet() samples it from a stream
+            entry = {"stream": True}
+            self.snippet_cache.put_snippets(blob_sha, entry)
+            return entry
+        
+        with METRICS.stage("snippet"):
+            blob = self.git.read_blob(commit_hash, "erosion.py")
+            if blob is None:
+                return None
+            text = blob[1]
+            
+            # Find interesting corrupted lines in one pass over the blob
+            corrupted_spans = self.scanner.scan(text)
+        
+        entry = {
+            # [line number, start, end] in the decoded text
+            "candidates": [[span.line_no, span.start, span.end] for span in corrupted_spans],
+            # [start, end]; only needed when nothing looks corrupted
+            "fallback": [] if corrupted_spans else [
+                [span.start, span.end] for span in self.scanner.iter_nonblank(text)
+            ]
+        }
+        self.snippet_cache.put_snippets(blob_sha, entry)
+        return entry
+    
+    def get_blob_stats(self, commit_hash):
+        """Histogram and entropy of erosion.py's bytes at a commit, cached by blob SHA"""
+        blob_sha = self.diffs.blob_id(commit_hash)
+        if blob_sha is None:
+            return None
+        
+        cached = self.snippet_cache.get_stats(blob_sha)
+        if cached is not None:
+            return blob_stats.BlobStats._make(cached)
+        
+        with METRICS.stage("stats"):
+            data = b"".join(self.git.iter_object_chunks(blob_sha, max_bytes=self.max_scan_bytes))
+            if not data and self.git.object_info(blob_sha) is None:
+                return None
+            stats = blob_stats.compute(data)
+        self.snippet_cache.put_stats(blob_sha, list(stats))
+        return stats
+    
+    def get_decay_trend(self, commit_hash, last=None):
+        """
+        Sparkline of the corruption score over the iterations up to a commit
+        
+        Empty unless the index reaches back to the root, so the same commit
+        never renders differently depending on how much history is local.
+        """
+        if not self.index.complete:
+            return ""
+        series = self.index.density_series(until=commit_hash, last=last or self.TREND_LENGTH)
+        if len(series) < 2:
+            return ""
+        return blob_stats.sparkline([score or 0 for _, _, score in series])
+    
+    def resolve_blobs(self, commit_hashes):
+        """
+        Resolve erosion.py's blob for many commits in one batched call;
+        returns {blob SHA: [commit hash, ...]}
+        
+        Per-blob analysis is cached by SHA, so each group is scanned once
+        however many commits share it.
+        """
+        with METRICS.stage("blobs"):
+            return self.diffs.resolve_blobs(commit_hashes)
+    
+    def get_corrupted_snippet(self, commit_hash, rng=None):
         """Extract a poetic snippet from the corrupted code"""
-        # Get the erosion.py file at specific commit
-        result = subprocess.run(
-            ["git", "show", f"{commit_hash}:erosion.py"],
-            cwd=self.local_erosion_path,
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode != 0:
+        rng = rng or self.rng_for(commit_hash)
+        # Get the erosion.py candidates at specific commit
+        entry = self.get_snippet_candidates(commit_hash)
+        
+        if entry is None:
             return None
         
-        lines = result.stdout.split('\n')
-        
-        # Find interesting corrupted lines
-        corrupted_lines = []
-        for i, line in enumerate(lines):
-            # Look for lines with visible corruption
-            if any(char in line for char in ['#', '*', '~', '`', '\t']) and len(line.strip()) > 0:
-                # Check for syntax errors or interesting patterns
-                if re.search(r'[a-z]\*[a-z]|[a-z]#[a-z]|^\s*\.|^\s*#\s*\d{4}', line):
-                    corrupted_lines.append((i, line))
-            # Also catch broken syntax
-            elif re.search(r'el\*e:|with#|def\s+\w+#|chars\s+i\]', line):
-                corrupted_lines.append((i, line))
-        
-        if not corrupted_lines:
-            # If no obvious corruption, pick random non-empty lines
-            non_empty = [(i, l) for i, l in enumerate(lines) if l.strip()]
-            if non_empty:
-                return random.choice(non_empty)[1][:280]
+        if entry.get("stream"):
+            return self.get_streamed_snippet(self.diffs.blob_id(commit_hash), rng)
+        
+        if not entry["candidates"] and not entry["fallback"]:
+            return None
+        
+        blob = self.git.read_blob(commit_hash, "erosion.py")
+        if blob is None:
             return None
+        text = blob[1]
+        
+        if not entry["candidates"]:
+            # If no obvious corruption, pick random non-empty lines
+            start, end = rng.choice(entry["fallback"])
+            return text[start:end][:280]
         
         # Select the most interesting corruption
-        line_num, chosen_line = random.choice(corrupted_lines)
+        line_num, start, end = rng.choice(entry["candidates"])
+        span = CandidateSpan(line_num, start, end, 0)
+        chosen_line = self.scanner.line(text, span)
         
         # Sometimes include context
-        if random.random() < 0.3 and line_num > 0:
-            context = lines[line_num - 1] if line_num > 0 else ""
-            return f"{context}\n{chosen_line}"[:280]
+        if rng.random() < 0.3 and line_num > 0:
+            return f"{self.scanner.previous_line(text, span)}\n{chosen_line}"[:280]
         
         return chosen_line[:280]
     
-    def get_diff_snippet(self, commit_hash):
-        """Get a visual diff showing the decay"""
-        result = subprocess.run(
-            ["git", "diff", f"{commit_hash}~1", commit_hash, "--", "erosion.py"],
-            cwd=self.local_erosion_path,
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode != 0 or not result.stdout:
+    def get_streamed_snippet(self, blob_sha, rng):
+        """
+        Snippet from a blob too large to scan whole: at most max_scan_bytes
+        are read in chunks, and one corrupted line is reservoir-sampled
+        together with the line before it
+        """
+        with METRICS.stage("snippet"):
+            pick = self.scanner.sample_stream(
+                self.git.iter_object_chunks(blob_sha, max_bytes=self.max_scan_bytes), rng)
+        METRICS.incr("snippets_streamed")
+        if pick is None:
             return None
         
-        # Find interesting diff chunks
-        diff_lines = result.stdout.split('\n')
-        changes = []
-        
-        for i, line in enumerate(diff_lines):
-            if line.startswith('-') and not line.startswith('---'):
-                # Find what was removed
-                removed = line[1:]
-                # Look for the corresponding addition
-                for j in range(i+1, min(i+5, len(diff_lines))):
-                    if diff_lines[j].startswith('+') and not diff_lines[j].startswith('+++'):
-                        added = diff_lines[j][1:]
-                        if len(removed) > 10 and len(added) > 10:
-                            changes.append((removed, added))
-                        break
+        line_num, chosen_line, context, corrupted = pick
+        # Same odds of including context as the in-memory path
+        if corrupted and rng.random() < 0.3 and line_num > 0:
+            return f"{context}\n{chosen_line}"[:280]
+        
+        return chosen_line[:280]
+    
+    def get_diff_changes(self, commit_hash):
+        """Lines a commit changed, as Change(removed, added, position, edit_distance)"""
+        if self.diffs.unchanged(commit_hash):
+            # erosion.py is byte-for-byte what it was; nothing to diff
+            METRICS.incr("diffs_skipped")
+            return []
+        with METRICS.stage("diff"):
+            return self.diffs.changes(commit_hash)
+    
+    def get_diff_snippet(self, commit_hash, rng=None):
+        """Get a visual diff showing the decay"""
+        rng = rng or self.rng_for(commit_hash)
+        # Pick among the changes that eroded the most, not merely the longest
+        changes = DiffEngine.most_eroded(self.get_diff_changes(commit_hash))
         
         if changes:
-            removed, added = random.choice(changes)
-            return f"was:\n{removed[:100]}\n\nnow:\n{added[:100]}"
+            change = rng.choice(changes)
+            return f"was:\n{change.removed[:100]}\n\nnow:\n{change.added[:100]}"
         
         return None
     
-    def should_use_hashtags(self, commit, iteration, decay_level):
+    def should_use_hashtags(self, commit, iteration, decay_level, rng=None):
         """Decide whether to include hashtags based on various factors"""
+        rng = rng or self.rng_for(commit['hash'])
+        
         # Always use hashtags for restoration events (special occasions)
         if "RESTORATION" in commit['message']:
             return True
@@ -163,7 +417,7 @@ class ErosionBroadcaster:
             return True
         
         # Random chance: 30% of the time for regular tweets
-        return random.random() < 0.3
+        return rng.random() < 0.3
 
     def get_hashtags(self, style_name, is_restoration=False):
         """Get appropriate hashtags based on context"""
@@ -177,13 +431,17 @@ class ErosionBroadcaster:
             "diagnostic": ["#SoftwareArt"],
             "abstract": ["#CodePoetry"],
             "verbose": ["#GenerativeArt"],
+            "historian": ["#CodeArchaeology"],
             "minimalist": []  # Minimalist style avoids extra tags
         }
         
         return base_tags + style_tags.get(style_name, [])
 
-    def generate_tweet(self, commit):
+    def generate_tweet(self, commit, rng=None):
         """Generate a poetic tweet from a commit"""
+        # One random stream per commit, shared by every step below
+        rng = rng or self.rng_for(commit['hash'])
+        
         iteration_match = re.search(r'iteration (\d+)', commit['message'])
         iteration = iteration_match.group(1) if iteration_match else "∞"
         
@@ -203,23 +461,24 @@ class ErosionBroadcaster:
         decay_level = decay_match.group(1) if decay_match else "unknown"
         
         # Get a corrupted snippet
-        snippet = self.get_corrupted_snippet(commit['hash'])
+        snippet = self.get_corrupted_snippet(commit['hash'], rng)
         
         # Decide whether to use hashtags
-        use_hashtags = self.should_use_hashtags(commit, iteration, decay_level)
+        use_hashtags = self.should_use_hashtags(commit, iteration, decay_level, rng)
         
         # Choose tweet style
         styles = [
             ("minimalist", self.minimalist_tweet),
             ("verbose", self.verbose_tweet),
             ("abstract", self.abstract_tweet),
-            ("diagnostic", self.diagnostic_tweet)
+            ("diagnostic", self.diagnostic_tweet),
+            ("historian", self.historian_tweet)
         ]
         
-        style_name, style_func = random.choice(styles)
-        return style_func(iteration, decay_level, snippet, commit, use_hashtags, style_name)
+        style_name, style_func = rng.choice(styles)
+        return style_func(iteration, decay_level, snippet, commit, use_hashtags, style_name, rng)
     
-    def minimalist_tweet(self, iteration, decay_level, snippet, commit, use_hashtags, style_name):
+    def minimalist_tweet(self, iteration, decay_level, snippet, commit, use_hashtags, style_name, rng=None):
         """Minimal, poetic style"""
         if snippet:
             # Clean up the snippet for poetry
@@ -234,9 +493,10 @@ class ErosionBroadcaster:
         
         return tweet
     
-    def verbose_tweet(self, iteration, decay_level, snippet, commit, use_hashtags, style_name):
+    def verbose_tweet(self, iteration, decay_level, snippet, commit, use_hashtags, style_name, rng=None):
         """More descriptive style"""
-        intro = random.choice([
+        rng = rng or self.rng_for(commit['hash'])
+        intro = rng.choice([
             f"The code continues to forget itself.",
             f"Hour {iteration}: progressive deterioration.",
             f"Syntax dissolves into memory.",
@@ -255,14 +515,11 @@ class ErosionBroadcaster:
         
         return tweet
     
-    def abstract_tweet(self, iteration, decay_level, snippet, commit, use_hashtags, style_name):
+    def abstract_tweet(self, iteration, decay_level, snippet, commit, use_hashtags, style_name, rng=None):
         """Abstract, artistic style"""
         if snippet and any(char in snippet for char in ['*', '#', '~', '`']):
             # If we have good corruption, let it speak
-            visual = ""
-            for char in snippet[:50]:
-                if char in ['*', '#', '~', '`', '.', ' ', '\t']:
-                    visual += char
+            visual = re.sub(r'[^*#~`. \t]', '', snippet[:50])
             
             if visual.strip():
                 tweet = f"{visual}\n\niteration {iteration}"
@@ -271,17 +528,19 @@ class ErosionBroadcaster:
                     tweet += f"\n{' '.join(hashtags)}"
                 return tweet
         
-        # Create abstract representation
-        decay_symbols = {
-            "minimal": "░",
-            "slight": "▒", 
-            "moderate": "▓",
-            "severe": "█",
-            "critical": "▪"
-        }
-        
-        symbol = decay_symbols.get(decay_level, "·")
-        bar = symbol * min(int(iteration) % 20 + 1, 20)
+        # Create abstract representation: the decay so far, or a bar if there's no history
+        bar = self.get_decay_trend(commit['hash'])
+        if not bar:
+            decay_symbols = {
+                "minimal": "░",
+                "slight": "▒", 
+                "moderate": "▓",
+                "severe": "█",
+                "critical": "▪"
+            }
+            
+            symbol = decay_symbols.get(decay_level, "·")
+            bar = symbol * min(int(iteration) % 20 + 1, 20)
         
         tweet = f"{bar}\n\niteration {iteration}: {decay_level}"
         if use_hashtags:
@@ -290,7 +549,7 @@ class ErosionBroadcaster:
         
         return tweet
     
-    def diagnostic_tweet(self, iteration, decay_level, snippet, commit, use_hashtags, style_name):
+    def diagnostic_tweet(self, iteration, decay_level, snippet, commit, use_hashtags, style_name, rng=None):
         """Technical, diagnostic style"""
         mutations_match = re.search(r'(\d+) mutations', commit['message'])
         mutations = mutations_match.group(1) if mutations_match else "?"
@@ -300,8 +559,50 @@ class ErosionBroadcaster:
         tweet += f"Decay: {decay_level}\n"
         tweet += f"Mutations: {mutations}"
         
+        stats = self.get_blob_stats(commit['hash'])
+        if stats:
+            tweet += f"\nEntropy: {stats.entropy:.2f} bits/byte"
+            tweet += f"\nMarked lines: {stats.marked_lines}/{stats.lines}"
+            histogram = blob_stats.histogram_bar(stats.histogram)
+            if histogram:
+                tweet += f" [{histogram}]"
+        trend = self.get_decay_trend(commit['hash'])
+        if trend:
+            tweet += f"\nTrend: {trend}"
+        
+        hashtags = f"\n\n{' '.join(self.get_hashtags(style_name))}" if use_hashtags else ""
+        
         if snippet and len(snippet) < 100:
-            tweet += f"\n\nCorruption sample:\n{snippet[:80]}"
+            sample = f"\n\nCorruption sample:\n{snippet[:80]}"
+            # The sample is the first thing to go when the stats fill the tweet
+            if len(tweet) + len(sample) + len(hashtags) <= 280:
+                tweet += sample
+        
+        return tweet + hashtags
+    
+    def historian_tweet(self, iteration, decay_level, snippet, commit, use_hashtags, style_name, rng=None):
+        """Looks back over the whole indexed history, as of this commit"""
+        if not self.index.complete:
+            # "So far" only means something over the whole history (see --backfill-index)
+            return self.minimalist_tweet(iteration, decay_level, snippet, commit, use_hashtags, style_name, rng)
+        
+        record = self.index.most_corrupted_line(until=commit['hash'])
+        fastest = self.index.fastest_decaying_functions(commit['hash'], k=1)
+        
+        if not record and not fastest:
+            # Not indexed (yet); fall back to the plainest style
+            return self.minimalist_tweet(iteration, decay_level, snippet, commit, use_hashtags, style_name, rng)
+        
+        tweet = f"iteration {iteration}: {decay_level}"
+        
+        if record:
+            tweet += f"\n\nmost corrupted line so far (iteration {record['iteration'] or '?'}):\n"
+            tweet += record['line'].strip()[:100]
+        
+        if fastest:
+            top = fastest[0]
+            commits = "commit" if top['span'] == 1 else f"{top['span']} commits"
+            tweet += f"\n\nfastest decay: {top['function']}() gained {top['gained']} corrupted lines in the last {commits}"
         
         if use_hashtags:
             hashtags = self.get_hashtags(style_name)
@@ -309,16 +610,29 @@ class ErosionBroadcaster:
         
         return tweet
     
+    def update_index(self, backfill=False):
+        """
+        Bring the corruption index up to date with the synced history; after
+        a backfill sync (see _sync) it covers everything from the root
+        """
+        started = time.monotonic()
+        with METRICS.stage("index"):
+            added = self.index.update(self.git, self.scanner)
+            if backfill and not self.index.complete:
+                self.index.mark_complete()
+        if added:
+            print(f"✓ Indexed {added} new commit(s) in {time.monotonic() - started:.2f}s")
+    
     def should_tweet(self, commit):
         """Determine if we should tweet about this commit"""
+        # Don't tweet the same commit twice, across the whole posting history
+        if commit['hash'] in self.store or commit['hash'] == self.state.get('last_tweeted_commit'):
+            return False
+        
         # Always tweet restorations
         if "RESTORATION" in commit['message']:
             return True
         
-        # Don't tweet the same commit twice
-        if commit['hash'] == self.state.get('last_tweeted_commit'):
-            return False
-        
         # Tweet based on iteration number 
         iteration_match = re.search(r'iteration (\d+)', commit['message'])
         if iteration_match:
@@ -333,63 +647,376 @@ class ErosionBroadcaster:
         
         return False
     
-    def broadcast(self, dry_run=True):
-        """Main broadcast function"""
+    def broadcast(self, dry_run=True, flush=True):
+        """
+        Main broadcast function
+        
+        With flush=False a live run only queues its tweet; the caller
+        drains the outbox later (the multi-repo engine does this).
+        
+        A live run that finds precomputed tweets in the Twitter outbox just
+        posts them; the analysis already happened in precompute(). Mirror
+        posts alone don't count, so a stuck mirror can't stall syncing.
+        """
         print(f"[{datetime.now()}] Starting erosion broadcast...")
         
-        # Update local copy of erosion repo
-        self.clone_or_pull_erosion()
+        ready = len(self.outbox.pending())
+        if not dry_run and flush and ready:
+            print(f"✓ {ready} tweet(s) ready in the outbox, posting without re-analysis")
+            self.flush_outbox()
+            return
         
-        # Get recent commits
-        commits = self.get_recent_commits(limit=20)
+        self._analyze(dry_run)
+        if not dry_run and flush:
+            self.flush_outbox()
+    
+    def precompute(self):
+        """
+        Analyze new commits now and queue ready-to-post tweets, so the next
+        live run only has to post them
+        
+        The outbox is topped up to TWEETS_PER_RUN; while it is full, new
+        commits are only indexed and stay pending for a later pick.
+        """
+        print(f"[{datetime.now()}] Precomputing upcoming tweets...")
+        room = self.TWEETS_PER_RUN - len(self.outbox.pending())
+        self._analyze(dry_run=False, k=max(room, 0))
+        print(f"✓ {len(self.outbox.pending())} tweet(s) queued for the next live run")
+    
+    def build_archive(self, out_dir="archive"):
+        """
+        Sync the whole history and bring the static archive in out_dir up
+        to date; only shards with new commits or new tweets are rewritten
+        """
+        # Only the archive needs the page generator; keep it off the startup path
+        from static_archive import StaticArchive
+        
+        print(f"[{datetime.now()}] Updating the archive in {out_dir}...")
+        with METRICS.stage("sync"):
+            # Every iteration is archived, so the history can't stop at SYNC_DEPTH
+            self._sync(backfill=True)
+        
+        try:
+            self.update_index(backfill=True)
+            with METRICS.stage("archive"):
+                StaticArchive(self, out_dir).build()
+        finally:
+            self.git.close()
+            self.index.close()
+            self.snippet_cache.save()
+    
+    def _analyze(self, dry_run, k=None):
+        """Sync, index, pick and render (or queue) the best pending commits"""
+        # Update local copy of erosion repo
+        with METRICS.stage("sync"):
+            self._sync(backfill=self.backfill_index)
         
-        if not commits:
-            print("No commits found")
+        try:
+            self.update_index(backfill=self.backfill_index)
+            if k != 0:
+                with METRICS.stage("pick"):
+                    self._broadcast_commits(dry_run, k)
+        finally:
+            # Release the long-lived git pipes (unless a daemon reuses them) and keep what we learned
+            if not self.keep_open:
+                self.git.close()
+                self.index.close()
+            self.snippet_cache.save()
+    
+    def _broadcast_commits(self, dry_run, k=None):
+        """Pick the most interesting pending commit(s) and tweet about them"""
+        # Stream what is new since the last run; only the shortlist gets rendered
+        chosen = CandidatePipeline(self, k=k or self.TWEETS_PER_RUN).select()
+        if not chosen:
+            print("No new commits to tweet about")
             return
         
-        # Find commits to tweet about
-        for commit in commits:
-            if self.should_tweet(commit):
-                tweet = self.generate_tweet(commit)
-                
-                if dry_run:
-                    print(f"\n{'='*50}")
-                    print(f"Would tweet ({len(tweet)} chars):")
-                    print(f"{'='*50}")
-                    print(tweet)
-                    print(f"{'='*50}\n")
-                else:
-                    # Actually post to Twitter
-                    if self.twitter.connected:
-                        tweet_id = self.twitter.post_tweet(tweet)
-                        if tweet_id:
-                            print(f"✓ Tweet posted successfully: https://twitter.com/i/web/status/{tweet_id}")
+        # Oldest first, so the cursor ends on the newest commit tweeted
+        for candidate in sorted(chosen, key=lambda c: -c.order):
+            commit, tweet = candidate.commit, candidate.tweet
+            
+            if dry_run:
+                print(f"\n{'='*50}")
+                print(f"Would tweet ({len(tweet)} chars, score {candidate.score:.2f}):")
+                print(f"{'='*50}")
+                print(tweet)
+                print(f"{'='*50}\n")
+            else:
+                # Queue durably first; the commit is safe even if posting fails
+                if self.get_publisher().enqueue(commit['hash'], tweet, message=commit['message']):
+                    METRICS.incr("tweets_queued")
+                self.store.record_tweeted(commit['hash'])
+            
+            self.state['last_tweeted_commit'] = commit['hash']
+            self.state['total_tweets'] += 1
+            
+            if "RESTORATION" in commit['message']:
+                self.state['last_restoration'] = commit['hash']
+            
+            self.save_state()
+    
+    def get_publisher(self):
+        """Twitter plus every mirror, each with its own outbox next to the state file"""
+        if self.publisher is None:
+            mirrors = destinations_from_env() if self.mirrors is None else self.mirrors
+            destinations = [Destination("twitter", self.twitter, 280, None)] + list(mirrors)
+            outboxes = {"twitter": self.outbox}
+            for destination in destinations[1:]:
+                outboxes[destination.name] = Outbox(
+                    self.state_file.with_name(f".broadcaster_outbox.{destination.name}.jsonl"))
+            self.publisher = Publisher(destinations, outboxes, self.snippet_cache)
+        return self.publisher
+    
+    def flush_outbox(self, poster=None, stop=None):
+        """
+        Post everything queued, to every destination at once, as fast as
+        each one allows
+        
+        poster overrides the Twitter poster (the engine passes a budgeted
+        one). Setting the stop event cuts rate-limit waits short; whatever
+        isn't posted stays queued.
+        """
+        with METRICS.stage("post"):
+            posted = self.get_publisher().flush(posters={"twitter": poster or self.twitter}, stop=stop,
+                                                on_posted={"twitter": self.store.record_posted})
+        return sum(posted.values())
+    
+    def replay(self, rev_range, output_path, seed=None, workers=None, batch_size=256):
+        """
+        Render tweets for every commit in a history range, oldest first,
+        and write them to a JSONL file
+        
+        Commits are streamed from git and rendered a batch at a time on a
+        process pool, so memory stays bounded however long the range is.
+        Every commit renders from its own seeded random stream, so the
+        output doesn't depend on how the work is split.
+        """
+        started = time.monotonic()
+        print(f"[{datetime.now()}] Replaying {rev_range}...")
+        
+        with METRICS.stage("sync"):
+            start_commit = rev_range.split("..", 1)[0] if ".." in rev_range else None
+            self._sync(backfill=self.backfill_index, reach=start_commit)
+            # Replayed commits the index already had may still lack their blobs
+            self._prefetch_blobs(rev_range)
+        
+        self.update_index(backfill=self.backfill_index)
+        # Workers open their own connection; don't carry this one across fork
+        self.index.close()
+        
+        # Only replay needs a process pool; keep it off the startup path
+        from multiprocessing import Pool
+        
+        workers = workers or os.cpu_count() or 1
+        seed = self.seed_salt if seed is None else seed
+        commits = self.git.iter_log(rev_range, reverse=True)
+        rendered = tweeted = 0
+        
+        pool = Pool(workers, initializer=_replay_init,
+                    initargs=(self.local_erosion_path, self.state_file, seed)) if workers > 1 else None
+        if pool is None:
+            _replay_init(self.local_erosion_path, self.state_file, seed)
+        
+        # Workers keep their own metrics; this times the whole render
+        with METRICS.stage("replay"):
+            try:
+                with open(output_path, 'w') as out:
+                    batch = self._replay_units(list(islice(commits, batch_size)))
+                    pending = pool.map_async(_replay_render_group, batch) if pool else None
+                    
+                    while batch:
+                        # Queue the next batch before writing this one out
+                        next_batch = self._replay_units(list(islice(commits, batch_size)))
+                        if pool:
+                            groups = pending.get()
+                            pending = pool.map_async(_replay_render_group, next_batch) if next_batch else None
                         else:
-                            print("⚠ Failed to post tweet")
-                    else:
-                        print("⚠ Twitter not connected, cannot post tweet")
-                
-                self.state['last_tweeted_commit'] = commit['hash']
-                self.state['total_tweets'] += 1
-                
-                if "RESTORATION" in commit['message']:
-                    self.state['last_restoration'] = commit['hash']
-                
-                self.save_state()
-                
-                # Only tweet once per run
-                break
-        else:
-            print("No new commits to tweet about")
+                            groups = [_replay_render_group(unit) for unit in batch]
+                        
+                        # Back into history order
+                        results = [record for _, record in sorted(pair for group in groups for pair in group)]
+                        for record in results:
+                            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                            rendered += 1
+                            tweeted += record["tweet"] is not None
+                        batch = next_batch
+            finally:
+                if pool:
+                    pool.close()
+                    pool.join()
+                self.git.close()
+        
+        METRICS.incr("commits_replayed", rendered)
+        elapsed = time.monotonic() - started
+        print(f"✓ Replayed {rendered} commits ({tweeted} tweets) in {elapsed:.2f}s -> {output_path}")
 
-if __name__ == "__main__":
-    import sys
     
-    broadcaster = ErosionBroadcaster()
-    dry_run = "--live" not in sys.argv
+    def _replay_units(self, batch):
+        """
+        Split a batch of commits into work units, one per distinct
+        erosion.py blob, so each blob is analysed by a single worker
+        
+        Units carry (position in batch, commit, blob pair); workers don't
+        resolve blobs again.
+        """
+        if not batch:
+            return []
+        positions = {commit['hash']: i for i, commit in enumerate(batch)}
+        groups = self.resolve_blobs(positions)
+        return [[(positions[h], batch[positions[h]], self.diffs.blob_ids[h]) for h in hashes]
+                for hashes in groups.values()]
+
+# Per-process broadcaster used by replay workers
+_replay_broadcaster = None
+
+
+def _replay_init(local_erosion_path, state_file, seed):
+    """Set up an offline broadcaster inside a replay worker"""
+    global _replay_broadcaster
+    broadcaster = ErosionBroadcaster(connect_twitter=False,
+                                     local_erosion_path=local_erosion_path,
+                                     state_file=state_file)
+    broadcaster.seed_salt = str(seed)
+    # Judge history as if nothing had been tweeted yet
+    broadcaster.store = StateStore(None)
+    broadcaster.state = broadcaster.initial_state()
+    _replay_broadcaster = broadcaster
+
+
+def _replay_render_group(unit):
+    """Render the commits of one work unit into (position, record) pairs"""
+    diffs = _replay_broadcaster.diffs
+    # Only this unit's blobs, so a worker's map stays as small as the unit
+    diffs.blob_ids = {commit['hash']: pair for _, commit, pair in unit}
+    return [(position, _replay_render(commit)) for position, commit, _ in unit]
+
+
+def _replay_render(commit):
+    """Render one commit into a replay record"""
+    tweet = None
+    if _replay_broadcaster.should_tweet(commit):
+        tweet = _replay_broadcaster.generate_tweet(commit)
+    
+    return {
+        "hash": commit['hash'],
+        "date": commit['date'],
+        "message": commit['message'],
+        "tweet": tweet
+    }
+
+
+def _run_cli(args):
+    """Everything the command line can ask for, after argument parsing"""
+    twitter_backend = None
+    if args.fake_twitter:
+        from fake_twitter import FakeTwitterBackend
+        twitter_backend = FakeTwitterBackend(latency=0.2)
+    
+    if args.config:
+        from engine import BroadcastEngine
+        if not args.live:
+            print("Running in DRY RUN mode (no actual tweets)")
+        BroadcastEngine.from_file(args.config, twitter_backend=twitter_backend).run(dry_run=not args.live)
+        return
+    
+    mirrors = None
+    if args.fake_mirrors:
+        from fake_servers import fake_mirrors
+        mirrors, _ = fake_mirrors(latency=0.2)
+    
+    broadcaster = ErosionBroadcaster(connect_twitter=not (args.replay or args.precompute or args.archive),
+                                     twitter_backend=twitter_backend, mirrors=mirrors)
+    dry_run = not args.live
+    
+    if args.full_clone:
+        broadcaster.sync_mode = "full"
+    
+    if args.backfill_index:
+        broadcaster.backfill_index = True
+    
+    if args.seed is not None:
+        broadcaster.seed_salt = args.seed
+    
+    if args.replay:
+        broadcaster.replay(args.replay, args.output, seed=args.seed, workers=args.workers)
+        return
+    
+    if args.precompute:
+        broadcaster.precompute()
+        return
+    
+    if args.archive:
+        broadcaster.build_archive(args.archive)
+        return
+    
+    if args.watch:
+        from watcher import Watcher
+        broadcaster.keep_open = True
+        watcher = Watcher(broadcaster, interval=args.interval, trigger_file=args.trigger_file,
+                          dry_run=dry_run, metrics_textfile=args.metrics_textfile)
+        watcher.install_signal_handlers()
+        watcher.run()
+        return
     
     if dry_run:
         print("Running in DRY RUN mode (no actual tweets)")
         print("Use --live flag to actually post tweets")
     
-    broadcaster.broadcast(dry_run=dry_run)
\ No newline at end of file
+    broadcaster.broadcast(dry_run=dry_run)
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Tweet the decay of the Digital Erosion artwork")
+    parser.add_argument("--live", action="store_true",
+                        help="actually post tweets (default is a dry run)")
+    parser.add_argument("--full-clone", action="store_true",
+                        help="use a plain full clone/pull instead of a shallow blobless sync")
+    parser.add_argument("--backfill-index", action="store_true",
+                        help="fetch and index the whole erosion history, enabling the history-based styles")
+    parser.add_argument("--fake-twitter", action="store_true",
+                        help="post to an in-process fake Twitter instead of the real API")
+    parser.add_argument("--fake-mirrors", action="store_true",
+                        help="mirror to local fake Mastodon and Bluesky servers instead of the environment's")
+    parser.add_argument("--config", metavar="FILE",
+                        help="broadcast every repository listed in a JSON engine config")
+    parser.add_argument("--precompute", action="store_true",
+                        help="analyze new commits and queue ready-to-post tweets without posting")
+    parser.add_argument("--archive", nargs="?", const="archive", metavar="DIR",
+                        help="build or update the static HTML/JSON archive of every iteration (default: archive/)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and broadcast whenever the erosion repo gets new commits")
+    parser.add_argument("--interval", type=float, default=300.0,
+                        help="seconds between remote polls in --watch mode (default: 300)")
+    parser.add_argument("--trigger-file", default=".broadcaster_trigger",
+                        help="in --watch mode, creating this file forces a poll (default: .broadcaster_trigger)")
+    parser.add_argument("--replay", metavar="FROM..TO",
+                        help="render tweets for every commit in a history range instead of broadcasting")
+    parser.add_argument("--output", default="replay.jsonl",
+                        help="where --replay writes its JSONL (default: replay.jsonl)")
+    parser.add_argument("--seed",
+                        help="salt mixed into every per-commit random seed (default: $EROSION_SEED_SALT)")
+    parser.add_argument("--workers", type=int,
+                        help="processes used by --replay (default: CPU count)")
+    parser.add_argument("--metrics-textfile", default=".broadcaster_metrics.prom",
+                        help="where to write this run's Prometheus metrics (default: .broadcaster_metrics.prom)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="run under cProfile and save the stats to FILE")
+    args = parser.parse_args()
+    
+    mode = ("replay" if args.replay else "engine" if args.config else "precompute" if args.precompute
+            else "archive" if args.archive else "watch" if args.watch else "live" if args.live else "dry_run")
+    try:
+        if args.profile:
+            from metrics import profiled
+            with profiled(args.profile):
+                _run_cli(args)
+        else:
+            _run_cli(args)
+    finally:
+        # Every run leaves one JSON line and a fresh textfile behind
+        METRICS.write_jsonl(".broadcaster_metrics.jsonl", mode=mode)
+        METRICS.write_prometheus(args.metrics_textfile, mode=mode)
+        print(f"Run metrics:\n{METRICS.summary()}")
+    
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Corruption Index for Erosion Broadcaster
+A SQLite index of how corrupted erosion.py was at every commit, updated
+with only the new commits on each run, so questions about the whole
+history ("most corrupted line ever") answer without rescanning blobs.
+"""
+
+import bisect
+import re
+import sqlite3
+from array import array
+from difflib import SequenceMatcher
+from itertools import islice
+from pathlib import Path
+from typing import List, Optional
+
+from corruption_scanner import MAX_STREAM_LINE
+
+# Bump whenever the tables change; an outdated index is rebuilt from scratch
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+-- One row per indexed commit, oldest first by seq
+CREATE TABLE IF NOT EXISTS commits (
+    seq INTEGER PRIMARY KEY,
+    hash TEXT UNIQUE NOT NULL,
+    date TEXT,
+    iteration INTEGER,
+    decay_level TEXT,
+    mutations INTEGER,
+    restoration INTEGER NOT NULL,
+    blob INTEGER,
+    corrupted_lines INTEGER NOT NULL,
+    corruption_score INTEGER NOT NULL,
+    best_score INTEGER NOT NULL,
+    best_line_no INTEGER,
+    best_line TEXT
+);
+CREATE INDEX IF NOT EXISTS commits_by_best ON commits (best_score DESC, seq);
+-- Per-line markers for each distinct blob, packed as arrays so 10k+
+-- iterations stay small; restored or unchanged files share a row
+CREATE TABLE IF NOT EXISTS blobs (
+    id INTEGER PRIMARY KEY,
+    sha TEXT UNIQUE NOT NULL,
+    line_nos BLOB NOT NULL,
+    scores BLOB NOT NULL,
+    corrupted_lines INTEGER NOT NULL,
+    corruption_score INTEGER NOT NULL,
+    best_score INTEGER NOT NULL,
+    best_line_no INTEGER,
+    best_line TEXT
+);
+-- Functions by position in the file (0 = module level), since erosion
+-- mangles their names; function is the name as it reads in that blob
+CREATE TABLE IF NOT EXISTS functions (
+    blob INTEGER NOT NULL,
+    ordinal INTEGER NOT NULL,
+    function TEXT NOT NULL,
+    corrupted_lines INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    PRIMARY KEY (blob, ordinal)
+) WITHOUT ROWID;
+"""
+
+ITERATION_PATTERN = re.compile(r'iteration (\d+)')
+DECAY_PATTERN = re.compile(r'(\w+) erosion')
+MUTATIONS_PATTERN = re.compile(r'(\d+) mutations')
+DEF_PATTERN = re.compile(r'^[ \t]*(?:async[ \t]+)?def[ \t]+(\w+)', re.M)
+
+# Lines above the first def
+MODULE_LEVEL = "<module>"
+
+
+class CorruptionIndex:
+    # Commits whose blobs are resolved per batched git call during update()
+    RESOLVE_CHUNK = 512
+
+    def __init__(self, path, path_in_repo: str = "erosion.py", max_blob_bytes: Optional[int] = None):
+        """
+        Bind to the index file at path; it is opened on first use
+
+        Only the first max_blob_bytes of a blob are scanned, so a runaway
+        file can't take the whole process's memory with it.
+        """
+        self.path = Path(path)
+        self.path_in_repo = path_in_repo
+        self.max_blob_bytes = max_blob_bytes
+        self._db = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            # Used by one thread at a time, but not always the one that opened it
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(SCHEMA)
+            if self._meta("version") != str(SCHEMA_VERSION):
+                # Tables may have changed shape, so recreate them rather than empty them
+                self._db.executescript(
+                    "DROP TABLE commits; DROP TABLE blobs; DROP TABLE functions; DELETE FROM meta;" + SCHEMA)
+                self._set_meta("version", str(SCHEMA_VERSION))
+                self._db.commit()
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def cursor(self) -> Optional[str]:
+        """The newest indexed commit, or None before the first update"""
+        return self._meta("cursor")
+
+    @property
+    def complete(self) -> bool:
+        """Whether the indexed commits reach back to the root of the history"""
+        return self._meta("complete") == "1"
+
+    def mark_complete(self):
+        """Record that the last update started from the root (see reset_commits)"""
+        with self.db:
+            self._set_meta("complete", "1")
+
+    def update(self, git, scanner) -> int:
+        """
+        Index every commit since the last update, oldest first; returns how
+        many were added
+
+        If the last indexed commit is no longer in history, the commit
+        table is rebuilt. Blob rows are content-addressed and kept.
+
+        Blob IDs are resolved a chunk of commits at a time; a commit that
+        left the file unchanged reuses the previous commit's blob row
+        without touching the blobs table.
+        """
+        db = self.db
+        cursor = self._meta("cursor")
+
+        if cursor and git.is_ancestor(cursor, "HEAD"):
+            commits = git.iter_log(f"{cursor}..HEAD", reverse=True)
+        else:
+            if cursor:
+                print(f"⚠ Indexed commit {cursor[:7]} is no longer in history, rebuilding the corruption index")
+            db.execute("DELETE FROM commits")
+            # Only the history that is local now gets indexed
+            db.execute("DELETE FROM meta WHERE key = 'complete'")
+            commits = git.iter_log(reverse=True)
+
+        seq = db.execute("SELECT COALESCE(MAX(seq), 0) FROM commits").fetchone()[0]
+        added = 0
+        # (blob SHA, blob row) of the previous commit; most commits share it
+        previous = (None, None)
+        with db:
+            while True:
+                chunk = list(islice(commits, self.RESOLVE_CHUNK))
+                if not chunk:
+                    break
+                shas = git.resolve_many(f"{commit['hash']}:{self.path_in_repo}" for commit in chunk)
+                for commit, blob_sha in zip(chunk, shas):
+                    seq += 1
+                    if blob_sha != previous[0]:
+                        previous = (blob_sha, self._index_blob(db, git, scanner, blob_sha) if blob_sha else None)
+                    self._add_commit(db, seq, commit, previous[1])
+                    cursor = commit['hash']
+                    added += 1
+            if cursor:
+                self._set_meta("cursor", cursor)
+        return added
+
+    def _add_commit(self, db, seq, commit, blob):
+        message = commit['message']
+        iteration = ITERATION_PATTERN.search(message)
+        decay = DECAY_PATTERN.search(message)
+        mutations = MUTATIONS_PATTERN.search(message)
+
+        if blob is None:
+            blob = (None, 0, 0, 0, None, None)
+
+        db.execute(
+            "INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (seq, commit['hash'], commit['date'],
+             int(iteration.group(1)) if iteration else None,
+             decay.group(1) if decay else None,
+             int(mutations.group(1)) if mutations else None,
+             int("RESTORATION" in message)) + blob)
+
+    def _index_blob(self, db, git, scanner, blob_sha) -> tuple:
+        """
+        Scan a blob the first time any commit points at it; returns
+        (id, corrupted_lines, corruption_score, best_score, best_line_no, best_line)
+        """
+        row = db.execute(
+            "SELECT id, corrupted_lines, corruption_score, best_score, best_line_no, best_line "
+            "FROM blobs WHERE sha = ?", (blob_sha,)).fetchone()
+        if row is not None:
+            return row
+
+        data = b"".join(git.iter_object_chunks(blob_sha, max_bytes=self.max_blob_bytes))
+        text = data.decode("utf-8", errors="replace")
+
+        # Attribute each corrupted line to the def above it
+        defs = [(m.start(), m.group(1)) for m in DEF_PATTERN.finditer(text)]
+        def_starts = [start for start, _ in defs]
+
+        line_nos = array('I')
+        scores = array('H')
+        # [corrupted lines, score] by ordinal; 0 is everything above the first def
+        per_function = [[0, 0] for _ in range(len(defs) + 1)]
+        best = None
+        for span in scanner.iter_candidates(text):
+            line_nos.append(span.line_no)
+            scores.append(min(span.score, 0xFFFF))
+            if best is None or span.score > best.score:
+                best = span
+            counts = per_function[bisect.bisect_right(def_starts, span.start)]
+            counts[0] += 1
+            counts[1] += span.score
+
+        stats = (len(line_nos), sum(scores), best.score if best else 0,
+                 best.line_no if best else None, scanner.line(text, best)[:MAX_STREAM_LINE] if best else None)
+        cur = db.execute(
+            "INSERT INTO blobs (sha, line_nos, scores, corrupted_lines, corruption_score, "
+            "best_score, best_line_no, best_line) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (blob_sha, line_nos.tobytes(), scores.tobytes()) + stats)
+        # Functions with no corruption still get a row, so decay can be measured from zero
+        names = [MODULE_LEVEL] + [name for _, name in defs]
+        db.executemany("INSERT INTO functions VALUES (?, ?, ?, ?, ?)",
+                       [(cur.lastrowid, ordinal, names[ordinal], count, score)
+                        for ordinal, (count, score) in enumerate(per_function)])
+        return (cur.lastrowid,) + stats
+
+    def line_markers(self, commit_hash: str) -> List[tuple]:
+        """(line_no, score) for every corrupted line of the file at a commit"""
+        row = self.db.execute(
+            "SELECT b.line_nos, b.scores FROM commits c JOIN blobs b ON b.id = c.blob WHERE c.hash = ?",
+            (commit_hash,)).fetchone()
+        if row is None:
+            return []
+        line_nos, scores = array('I'), array('H')
+        line_nos.frombytes(row[0])
+        scores.frombytes(row[1])
+        return list(zip(line_nos, scores))
+
+    def _seq(self, commit_hash: Optional[str]) -> Optional[int]:
+        """Position of a commit in the index; None means "the latest" """
+        if commit_hash is None:
+            row = self.db.execute("SELECT MAX(seq) FROM commits").fetchone()
+        else:
+            row = self.db.execute("SELECT seq FROM commits WHERE hash = ?", (commit_hash,)).fetchone()
+        return row[0] if row else None
+
+    def commit_stats(self, commit_hash: str) -> Optional[dict]:
+        """Everything indexed about one commit"""
+        cur = self.db.execute("SELECT * FROM commits WHERE hash = ?", (commit_hash,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        return dict(zip([d[0] for d in cur.description], row))
+
+    def commit_rows(self, commit_hashes) -> dict:
+        """commit_stats() for many commits in a few queries: {hash: row}; unindexed ones are left out"""
+        hashes = list(commit_hashes)
+        rows = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            part = hashes[start:start + 500]
+            cur = self.db.execute(
+                f"SELECT * FROM commits WHERE hash IN ({','.join('?' * len(part))})", part)
+            names = [d[0] for d in cur.description]
+            for row in cur:
+                record = dict(zip(names, row))
+                rows[record["hash"]] = record
+        return rows
+
+    def reset_commits(self):
+        """Forget every indexed commit so the next update() starts from the root; blob rows are kept"""
+        with self.db:
+            self.db.execute("DELETE FROM commits")
+            self.db.execute("DELETE FROM meta WHERE key IN ('cursor', 'complete')")
+
+    def most_corrupted_line(self, until: Optional[str] = None) -> Optional[dict]:
+        """
+        The most heavily marked line seen up to a commit (default: ever),
+        with the first iteration it appeared in
+        """
+        seq = self._seq(until)
+        if seq is None:
+            return None
+        row = self.db.execute(
+            "SELECT best_score, best_line, best_line_no, iteration, hash FROM commits "
+            "WHERE seq <= ? AND best_line IS NOT NULL ORDER BY best_score DESC, seq LIMIT 1",
+            (seq,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("score", "line", "line_no", "iteration", "hash"), row))
+
+    def _functions_at(self, seq: int) -> List[tuple]:
+        """(name, corrupted_lines) of each function at a commit, in file order"""
+        return self.db.execute(
+            "SELECT f.function, f.corrupted_lines FROM commits c JOIN functions f ON f.blob = c.blob "
+            "WHERE c.seq = ? ORDER BY f.ordinal", (seq,)).fetchall()
+
+    @staticmethod
+    def match_functions(past: List[str], now: List[str]) -> dict:
+        """
+        Pair each function now with the one it was `window` commits ago:
+        {index in now: index in past}
+
+        Names that survived pair up directly. In between, functions pair by
+        position, so a def whose name erosion mangled still matches its
+        former self; only the surplus side of an uneven gap (a def that
+        appeared or stopped parsing) is left unpaired.
+        """
+        pairs = {}
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, past, now, autojunk=False).get_opcodes():
+            if tag in ("equal", "replace"):
+                for offset in range(min(i2 - i1, j2 - j1)):
+                    pairs[j1 + offset] = i1 + offset
+        return pairs
+
+    def fastest_decaying_functions(self, commit_hash: Optional[str] = None,
+                                   window: int = 50, k: int = 3) -> List[dict]:
+        """
+        Functions that gained the most corrupted lines over the last
+        `window` commits up to commit_hash (default: the latest), named
+        as they read at the start of the window
+
+        "span" is how many commits the gain took, which is less than
+        window when fewer commits are indexed before commit_hash.
+        """
+        seq = self._seq(commit_hash)
+        if seq is None:
+            return []
+        base_seq = max(seq - window, 1)
+        now = self._functions_at(seq)
+        past = self._functions_at(base_seq)
+        pairs = self.match_functions([name for name, _ in past], [name for name, _ in now])
+
+        decaying = []
+        for i, (name, count) in enumerate(now):
+            before = past[pairs[i]] if i in pairs else (name, 0)
+            if count > before[1]:
+                decaying.append({"function": before[0], "corrupted_lines": count,
+                                 "gained": count - before[1], "span": seq - base_seq})
+        decaying.sort(key=lambda f: (-f["gained"], f["function"]))
+        return decaying[:k]
+
+    def density_series(self, until: Optional[str] = None, last: int = 100) -> List[tuple]:
+        """(iteration, corrupted_lines, corruption_score) for the last commits, oldest first"""
+        seq = self._seq(until)
+        if seq is None:
+            return []
+        rows = self.db.execute(
+            "SELECT iteration, corrupted_lines, corruption_score FROM commits "
+            "WHERE seq <= ? AND seq > ? ORDER BY seq",
+            (seq, seq - last)).fetchall()
+        return rows
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Corruption Scanner for Erosion Broadcaster
+Finds visibly corrupted lines in a blob with one precompiled pattern and a
+single pass over the text.
+"""
+
+import codecs
+import math
+import re
+from collections import namedtuple
+from typing import Iterable, Iterator, List, Optional
+
+# A candidate line: its 0-based line number, [start, end) offsets in the blob
+# and how heavily it is marked by corruption characters
+CandidateSpan = namedtuple("CandidateSpan", ["line_no", "start", "end", "score"])
+
+# Per-line heuristics: a line marked with any of # * ~ ` or a tab needs a
+# "marked" pattern, any other line can still qualify through a "broken
+# syntax" pattern
+MARKED_PATTERN = r'[a-z]\*[a-z]|[a-z]#[a-z]|^\s*\.|^\s*#\s*\d{4}'
+BROKEN_SYNTAX_PATTERN = r'el\*e:|with#|def\s+\w+#|chars\s+i\]'
+
+# Every heuristic above needs one of these on the line: a '*', '#' or ']',
+# or a '.' as the first visible character. Searching the whole blob for them
+# is a cheap superset filter; only the lines it hits get the exact check.
+LOCATE_PATTERN = r'[*#\]]|\n[^\S\n]*\.'
+LEADING_DOT_PATTERN = r'[^\S\n]*\.'
+
+# Longest line the streaming sampler keeps; the rest of a runaway line is skipped
+MAX_STREAM_LINE = 4096
+
+
+class Reservoir:
+    """
+    A size-one reservoir sample: every offered item is equally likely to
+    be the one kept, in O(1) memory
+
+    Uses Algorithm L, which jumps straight to the next item that will
+    replace the current pick, so a run of n items costs O(log n) random
+    draws rather than n.
+    """
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.seen = 0
+        self.item = None
+        self._w = 1.0
+        self._next = 1
+
+    def offer(self) -> bool:
+        """Count one more item; True if it should replace the current pick (call keep())"""
+        self.seen += 1
+        if self.seen < self._next:
+            return False
+        self._w *= self.rng.random()
+        if self._w > 0.0:
+            self._next = self.seen + int(math.log(1.0 - self.rng.random()) / math.log1p(-self._w)) + 1
+        else:
+            self._next = math.inf
+        return True
+
+    def keep(self, item):
+        self.item = item
+
+
+class CorruptionScanner:
+    def __init__(self):
+        """Compile the combined blob-wide locator and the per-line checks once"""
+        self._locate = re.compile(LOCATE_PATTERN)
+        self._leading_dot = re.compile(LEADING_DOT_PATTERN)
+        self._marked = re.compile(MARKED_PATTERN)
+        self._broken = re.compile(BROKEN_SYNTAX_PATTERN)
+
+    def is_corrupted(self, line: str) -> bool:
+        """The per-line heuristic, for a single line without its newline"""
+        if ('#' in line or '*' in line or '~' in line or '`' in line
+                or '\t' in line) and line.strip():
+            return self._marked.search(line) is not None
+        return self._broken.search(line) is not None
+
+    @staticmethod
+    def score(line: str) -> int:
+        """How heavily a line is marked by corruption characters"""
+        return line.count('#') + line.count('*') + line.count('~') + line.count('`')
+
+    def iter_candidates(self, text: str) -> Iterator[CandidateSpan]:
+        """
+        Stream corrupted lines in order
+
+        The combined locator jumps straight to the next line that could
+        qualify; only those lines get the exact per-line check.
+        """
+        locate = self._locate.search
+        marked = self._marked.search
+        broken = self._broken.search
+        count = text.count
+        rfind = text.rfind
+        find = text.find
+        length = len(text)
+        line_no = 0
+        counted_to = 0
+
+        # A leading-dot first line has no newline in front of it to match
+        if self._leading_dot.match(text):
+            hit = 0
+        else:
+            match = locate(text)
+            hit = match.start() + (text[match.start()] == '\n') if match else None
+
+        while hit is not None:
+            # Searches always resume at a line boundary, so look back at
+            # most to the start of the line the hit belongs to
+            start = rfind('\n', counted_to, hit) + 1 or counted_to
+            end = find('\n', hit)
+            if end == -1:
+                end = length
+
+            line_no += count('\n', counted_to, start)
+            counted_to = start
+
+            # Same check as is_corrupted(), inlined for the hot path
+            line = text[start:end]
+            if ('#' in line or '*' in line or '~' in line or '`' in line
+                    or '\t' in line) and line.strip():
+                corrupted = marked(line) is not None
+            else:
+                corrupted = broken(line) is not None
+            if corrupted:
+                yield CandidateSpan(line_no, start, end,
+                                    line.count('#') + line.count('*') +
+                                    line.count('~') + line.count('`'))
+
+            if end >= length:
+                return
+            # Resume on this line's newline so a leading-dot next line is seen
+            match = locate(text, end)
+            hit = match.start() + (text[match.start()] == '\n') if match else None
+
+    def sample_stream(self, chunks: Iterable[bytes], rng,
+                      max_line: int = MAX_STREAM_LINE) -> Optional[tuple]:
+        """
+        Pick one random corrupted line from a blob streamed as byte chunks
+
+        Bytes are decoded leniently (invalid UTF-8 becomes U+FFFD) and lines
+        longer than max_line are cut short, so memory is bounded by the
+        chunk size however large or broken the blob is. Each chunk's
+        complete lines go through iter_candidates() as one block.
+
+        Returns (line_no, line, previous_line, corrupted), or None for a
+        blank blob. corrupted is False when nothing looked corrupted and a
+        random non-blank line was picked instead.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        corrupted = Reservoir(rng)
+        fallback = Reservoir(rng)
+        carry = ""         # the unfinished line at the end of the last chunk
+        skipping = False   # dropping the rest of an over-long line
+        previous = ""      # the line just before the current block
+        line_no = 0        # number of the current block's first line
+
+        def scan_block(block):
+            nonlocal previous, line_no
+            for span in self.iter_candidates(block):
+                if corrupted.offer():
+                    before = self.previous_line(block, span) if span.start else previous
+                    corrupted.keep((line_no + span.line_no, block[span.start:span.end][:max_line],
+                                    before[:max_line]))
+            if not corrupted.seen:
+                # Only needed while nothing looks corrupted
+                for span in self.iter_nonblank(block):
+                    if fallback.offer():
+                        fallback.keep((line_no + span.line_no, block[span.start:span.end][:max_line], ""))
+            line_no += block.count('\n') + 1
+            previous = block[block.rfind('\n') + 1:][:max_line]
+
+        for chunk in chunks:
+            text = decoder.decode(chunk)
+            if skipping:
+                newline = text.find('\n')
+                if newline == -1:
+                    continue
+                text = text[newline:]
+                skipping = False
+            last = text.rfind('\n')
+            if last != -1:
+                scan_block(carry + text[:last])
+                carry = text[last + 1:]
+            else:
+                carry += text
+            if len(carry) > max_line:
+                carry = carry[:max_line]
+                skipping = True
+
+        if not skipping:
+            carry += decoder.decode(b"", final=True)
+        if carry:
+            scan_block(carry[:max_line])
+
+        if corrupted.seen:
+            return corrupted.item + (True,)
+        if fallback.seen:
+            return fallback.item + (False,)
+        return None
+
+    def scan(self, text: str) -> List[CandidateSpan]:
+        """All candidate spans for a blob"""
+        return list(self.iter_candidates(text))
+
+    def iter_nonblank(self, text: str) -> Iterator[CandidateSpan]:
+        """Fallback spans: every line with any visible content"""
+        start = 0
+        line_no = 0
+        length = len(text)
+        while start <= length:
+            end = text.find('\n', start)
+            if end == -1:
+                end = length
+            if text[start:end].strip():
+                yield CandidateSpan(line_no, start, end, 0)
+            start = end + 1
+            line_no += 1
+
+    @staticmethod
+    def line(text: str, span: CandidateSpan) -> str:
+        """Text of a span"""
+        return text[span.start:span.end]
+
+    @staticmethod
+    def previous_line(text: str, span: CandidateSpan) -> str:
+        """The line just before a span, or "" for the first line"""
+        if span.start == 0:
+            return ""
+        return text[text.rfind('\n', 0, span.start - 1) + 1:span.start - 1]
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Diff Engine for Erosion Broadcaster
+Turns `git diff-tree` patches into structured change records, pairing
+removed and added lines in one linear pass and scoring how far each line
+drifted, so the most eroded changes can be picked first.
+"""
+
+import heapq
+import re
+from collections import OrderedDict, namedtuple
+from typing import Dict, Iterable, Iterator, List
+
+# One changed line: its old and new text, its line number in the new file,
+# and the character edit distance between the two
+Change = namedtuple("Change", ["removed", "added", "position", "edit_distance"])
+
+HUNK_HEADER = re.compile(r'@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@')
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance, after trimming the prefix and suffix both lines share"""
+    start = 0
+    limit = min(len(a), len(b))
+    while start < limit and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+
+    if not a or not b:
+        return len(a) + len(b)
+    if len(a) > len(b):
+        a, b = b, a
+
+    # Myers/Hyyrö bit-vector algorithm: one column of the DP table per
+    # character of b, held in the bits of an int, so the cost is linear
+    m = len(a)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+
+    pv, mv, score = full, 0, m
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+    return score
+
+
+def iter_changes(diff_text: str) -> Iterator[Change]:
+    """
+    Stream Change records from a unified diff
+
+    Within each block of edits, the k-th removed line is paired with the
+    k-th added line; unpaired lines are pure insertions or deletions and
+    are skipped.
+    """
+    removed = []
+    paired = 0
+    new_line = 0
+    in_hunk = False
+
+    for line in diff_text.split('\n'):
+        if line.startswith('@@'):
+            match = HUNK_HEADER.match(line)
+            new_line = int(match.group(1)) if match else 0
+            removed, paired, in_hunk = [], 0, True
+        elif not in_hunk:
+            # File header: diff --git, index, ---, +++
+            continue
+        elif line.startswith('-'):
+            if paired:
+                # A new block of edits begins after the previous one's additions
+                removed, paired = [], 0
+            removed.append(line[1:])
+        elif line.startswith('+'):
+            if paired < len(removed):
+                old = removed[paired]
+                new = line[1:]
+                yield Change(old, new, new_line, edit_distance(old, new))
+            paired += 1
+            new_line += 1
+        elif line.startswith('\\'):
+            # "\ No newline at end of file"
+            continue
+        else:
+            removed, paired = [], 0
+            new_line += 1
+
+
+class DiffEngine:
+    def __init__(self, git, cache, path: str = "erosion.py"):
+        """
+        Args:
+            git: GitObjectReader for the erosion clone
+            cache: SnippetCache; results are keyed by (old blob, new blob)
+            path: The file whose changes are analysed
+        """
+        self.git = git
+        self.cache = cache
+        self.path = path
+        # commit hash -> (parent's blob SHA, blob SHA) for the path
+        self.blob_ids = {}
+
+    # Forget the blob map past this many commits, so a long-lived process stays bounded
+    MAX_BLOB_IDS = 20000
+
+    def resolve_blobs(self, commit_hashes: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Resolve the blob pair of every commit in one batched call, and
+        group the commits by the blob they point at
+
+        Returns {blob SHA: [commit hash, ...]} in first-seen order; commits
+        without the file are grouped under None. Later blob_pair() calls
+        for these commits are answered from memory.
+        """
+        commit_hashes = list(commit_hashes)
+        # This call's pairs, held locally: making room may clear blob_ids under us
+        pairs = {h: self.blob_ids.get(h) for h in dict.fromkeys(commit_hashes)}
+        unknown = [h for h, pair in pairs.items() if pair is None]
+        if unknown:
+            self._make_room(len(unknown))
+            specs = []
+            for commit_hash in unknown:
+                specs += [f"{commit_hash}~1:{self.path}", f"{commit_hash}:{self.path}"]
+            shas = self.git.resolve_many(specs)
+            for i, commit_hash in enumerate(unknown):
+                pairs[commit_hash] = self.blob_ids[commit_hash] = (shas[2 * i], shas[2 * i + 1])
+
+        groups = OrderedDict()
+        for commit_hash in commit_hashes:
+            groups.setdefault(pairs[commit_hash][1], []).append(commit_hash)
+        return groups
+
+    def _make_room(self, count: int):
+        if len(self.blob_ids) + count > self.MAX_BLOB_IDS:
+            self.blob_ids.clear()
+
+    def blob_pair(self, commit_hash: str):
+        pair = self.blob_ids.get(commit_hash)
+        if pair is None:
+            pair = (self.git.resolve(f"{commit_hash}~1:{self.path}"),
+                    self.git.resolve(f"{commit_hash}:{self.path}"))
+            self._make_room(1)
+            self.blob_ids[commit_hash] = pair
+        return pair
+
+    def blob_id(self, commit_hash: str):
+        """The path's blob SHA at a commit, or None if the file isn't there"""
+        pair = self.blob_ids.get(commit_hash)
+        if pair is not None:
+            return pair[1]
+        return self.git.resolve(f"{commit_hash}:{self.path}")
+
+    def unchanged(self, commit_hash: str) -> bool:
+        """True if the commit left the file's blob as it was; such commits need no diff"""
+        old_sha, new_sha = self.blob_pair(commit_hash)
+        return old_sha is not None and old_sha == new_sha
+
+    def iter_commit_changes(self, commit_hashes: Iterable[str]) -> Iterator[tuple]:
+        """
+        Stream (commit_hash, [Change, ...]) for many commits
+
+        Cached blob pairs are answered straight away; everything else is
+        diffed through a single `git diff-tree --stdin` process.
+        """
+        misses = {}
+        for commit_hash in commit_hashes:
+            if len(commit_hash) != 40:
+                # diff-tree --stdin only echoes full hashes back
+                commit_hash = self.git.resolve(commit_hash) or commit_hash
+            old_sha, new_sha = self.blob_pair(commit_hash)
+            if not old_sha or not new_sha or old_sha == new_sha:
+                # Root commit, deleted file, or the file wasn't touched
+                yield commit_hash, []
+                continue
+            cached = self.cache.get_changes(old_sha, new_sha)
+            if cached is not None:
+                yield commit_hash, list(map(Change._make, cached))
+            else:
+                misses[commit_hash] = (old_sha, new_sha)
+
+        if not misses:
+            return
+        for commit_hash, diff_text in self.git.iter_diffs(list(misses), self.path):
+            changes = list(iter_changes(diff_text))
+            self.cache.put_changes(*misses[commit_hash], [list(c) for c in changes])
+            yield commit_hash, changes
+
+    def changes(self, commit_hash: str) -> List[Change]:
+        """Changes made by one commit"""
+        for _, changes in self.iter_commit_changes([commit_hash]):
+            return changes
+        return []
+
+    @staticmethod
+    def most_eroded(changes: Iterable[Change], k: int = 5, min_length: int = 10) -> List[Change]:
+        """The k substantial changes that drifted furthest from the original"""
+        substantial = (c for c in changes if len(c.removed) > min_length and len(c.added) > min_length)
+        return heapq.nsmallest(k, substantial, key=lambda c: (-c.edit_distance, c.position))
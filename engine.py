@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Broadcast Engine for Erosion Broadcaster
+Runs one bot process over many eroding repositories. Each repository has
+its own clone, state and cursor, work runs on a bounded pool, and every
+post draws from one shared rate-limit budget.
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from broadcast import ErosionBroadcaster
+from publishers import BudgetedPoster, RateBudget, destinations_from_env
+from twitter_integration import TwitterPoster
+
+
+class BroadcastEngine:
+    def __init__(self, config: dict, twitter_backend=None):
+        """
+        Build one broadcaster per configured repository
+
+        Config:
+            {
+              "max_workers": 4,
+              "state_dir": "./state",
+              "clone_dir": "./clones",
+              "rate_limit": {"posts": 50, "window": 900},
+              "repositories": [{"name": "digital-erosion", "url": "https://..."}, ...]
+            }
+
+        Each repository may also set its own "clone" and "state" paths.
+        """
+        self.max_workers = config.get("max_workers", 4)
+        state_dir = Path(config.get("state_dir", "./state"))
+        clone_dir = Path(config.get("clone_dir", "./clones"))
+        limit = config.get("rate_limit", {"posts": 50, "window": 900})
+
+        self.budget = RateBudget(limit["posts"], limit["window"])
+        self.poster = BudgetedPoster(TwitterPoster(backend=twitter_backend), self.budget)
+        # One poster and one budget per mirror, shared by every repository like the Twitter one
+        self.mirrors = destinations_from_env()
+
+        self.broadcasters = {}
+        for repo in config["repositories"]:
+            name = repo["name"]
+            state_file = Path(repo.get("state", state_dir / name / ".broadcaster_state.json"))
+            state_file.parent.mkdir(parents=True, exist_ok=True)
+            self.broadcasters[name] = ErosionBroadcaster(
+                connect_twitter=False,
+                erosion_repo=repo["url"],
+                local_erosion_path=repo.get("clone", clone_dir / name),
+                state_file=state_file,
+                mirrors=self.mirrors
+            )
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, 'r') as f:
+            return cls(json.load(f), **kwargs)
+
+    def _run_one(self, name, dry_run):
+        """Sync, pick and render (queue) for one repository"""
+        started = time.monotonic()
+        try:
+            self.broadcasters[name].broadcast(dry_run=dry_run, flush=False)
+            return name, None, time.monotonic() - started
+        except Exception as e:
+            return name, e, time.monotonic() - started
+
+    def _flush_one(self, name):
+        return self.broadcasters[name].flush_outbox(self.poster)
+
+    def run(self, dry_run=True):
+        """Broadcast every repository; wall time scales with the pool, not the repo count"""
+        started = time.monotonic()
+        print(f"Broadcasting {len(self.broadcasters)} repositories on {self.max_workers} workers")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(lambda name: self._run_one(name, dry_run), self.broadcasters))
+
+            for name, error, elapsed in results:
+                if error:
+                    print(f"⚠ {name}: failed after {elapsed:.2f}s: {error}")
+                else:
+                    print(f"✓ {name}: done in {elapsed:.2f}s")
+
+            posted = 0
+            if not dry_run and self.poster.connected:
+                # (connected is checked here once, so workers never race to authenticate)
+                for mirror in self.mirrors:
+                    mirror.poster.connected
+                # Every repository drains its outbox against the shared budgets
+                posted = sum(pool.map(self._flush_one, self.broadcasters))
+
+        print(f"✓ Engine finished in {time.monotonic() - started:.2f}s"
+              + (f", posted {posted} tweet(s)" if not dry_run else ""))
+        return results
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Fake Servers for Erosion Broadcaster
+Local HTTP stand-ins for the Mastodon and Bluesky APIs, with latency,
+rate-limit windows, length limits and duplicate handling, so the
+multi-destination publisher can be exercised offline.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from publishers import BlueskyPoster, Destination, MastodonPoster, RateBudget
+
+
+class FakeServer:
+    def __init__(self, latency: float = 0.0, rate_limit: int = 300, window: float = 900.0,
+                 max_length: int = 500):
+        """
+        Args:
+            latency: Seconds every request takes
+            rate_limit: Posts allowed per window before 429s start
+            window: Length of a rate-limit window in seconds
+            max_length: Longest post accepted
+        """
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window = window
+        self.max_length = max_length
+        self.posts = []
+        self._requests = deque()
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        """Listen on a free localhost port from a background thread"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else {}
+                if fake.latency:
+                    time.sleep(fake.latency)
+                self._reply(*fake.respond(method, self.path, self.headers, body))
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def limited(self) -> Optional[float]:
+        """None if a post may go through now, else the epoch time the window frees up"""
+        now = time.time()
+        with self._lock:
+            while self._requests and self._requests[0] <= now - self.window:
+                self._requests.popleft()
+            if len(self._requests) >= self.rate_limit:
+                return self._requests[0] + self.window
+            self._requests.append(now)
+            return None
+
+    def respond(self, method: str, path: str, headers, body: dict) -> tuple:
+        """(status, JSON body[, headers]) for one request"""
+        raise NotImplementedError
+
+
+class FakeMastodonServer(FakeServer):
+    def __init__(self, token: str = "fake-token", **kwargs):
+        super().__init__(**kwargs)
+        self.token = token
+        self._by_key = {}
+
+    def respond(self, method, path, headers, body):
+        if headers.get("Authorization") != f"Bearer {self.token}":
+            return 401, {"error": "The access token is invalid"}
+        if method == "GET" and path == "/api/v1/accounts/verify_credentials":
+            return 200, {"acct": "erosion_fake"}
+        if method == "POST" and path == "/api/v1/statuses":
+            key = headers.get("Idempotency-Key")
+            with self._lock:
+                if key in self._by_key:
+                    # Mastodon answers a repeated request with the original status
+                    return 200, self._by_key[key]
+            reset_at = self.limited()
+            if reset_at is not None:
+                reset = datetime.fromtimestamp(reset_at, timezone.utc).isoformat().replace("+00:00", "Z")
+                return 429, {"error": "Too many requests"}, {"X-RateLimit-Reset": reset}
+            if len(body.get("status", "")) > self.max_length:
+                return 422, {"error": "Validation failed: Text character limit exceeded"}
+            with self._lock:
+                status = {"id": str(100000 + len(self.posts)), "content": body["status"]}
+                self.posts.append(body["status"])
+                if key:
+                    self._by_key[key] = status
+            return 200, status
+        return 404, {"error": "Record not found"}
+
+
+class FakeBlueskyServer(FakeServer):
+    def __init__(self, handle: str = "erosion.fake", password: str = "fake-password",
+                 max_length: int = 300, **kwargs):
+        super().__init__(max_length=max_length, **kwargs)
+        self.handle = handle
+        self.password = password
+        self.did = "did:plc:erosionfake"
+        self.token = "fake-jwt"
+
+    def respond(self, method, path, headers, body):
+        if method == "POST" and path == "/xrpc/com.atproto.server.createSession":
+            if body.get("identifier") != self.handle or body.get("password") != self.password:
+                return 401, {"error": "AuthenticationRequired", "message": "Invalid identifier or password"}
+            return 200, {"accessJwt": self.token, "did": self.did, "handle": self.handle}
+        if method == "POST" and path == "/xrpc/com.atproto.repo.createRecord":
+            if headers.get("Authorization") != f"Bearer {self.token}":
+                return 400, {"error": "ExpiredToken", "message": "Token has expired"}
+            reset_at = self.limited()
+            if reset_at is not None:
+                return 429, {"error": "RateLimitExceeded"}, {"ratelimit-reset": str(int(reset_at))}
+            text = body.get("record", {}).get("text", "")
+            if len(text) > self.max_length:
+                return 400, {"error": "InvalidRequest", "message": "Record/text must not be longer than 300 graphemes"}
+            with self._lock:
+                rkey = f"{len(self.posts):013d}"
+                self.posts.append(text)
+            return 200, {"uri": f"at://{self.did}/app.bsky.feed.post/{rkey}", "cid": "bafyfake"}
+        return 404, {"error": "MethodNotImplemented"}
+
+
+def fake_mirrors(latency: float = 0.0):
+    """Start a fake Mastodon and Bluesky; returns (destinations, servers) for offline runs"""
+    mastodon = FakeMastodonServer(latency=latency).start()
+    bluesky = FakeBlueskyServer(latency=latency).start()
+    destinations = [
+        Destination("mastodon", MastodonPoster(mastodon.url, mastodon.token), 500, RateBudget(300, 3 * 3600)),
+        Destination("bluesky", BlueskyPoster(bluesky.url, bluesky.handle, bluesky.password),
+                    300, RateBudget(1000, 3600)),
+    ]
+    return destinations, [mastodon, bluesky]
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Fake Twitter for Erosion Broadcaster
+An in-process stand-in for the Twitter API with latency, rate-limit windows,
+duplicate rejection and ID assignment, for load tests and offline runs.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from async_poster import AsyncTwitterBackend
+from twitter_integration import DuplicateTweetError, RateLimitError, TwitterBackend
+
+
+class SystemClock:
+    """Real wall-clock time"""
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class FakeClock:
+    """Simulated time: sleeping just moves the clock, so runs are instant and repeatable"""
+    def __init__(self, start: float = 1_700_000_000.0):
+        self.now = start
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            with self._lock:
+                self.now += seconds
+
+
+class FakeTwitterBackend(TwitterBackend):
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 rate_limit: int = 200, window: float = 900.0,
+                 duplicate_window: int = 100, clock=None, seed: int = 0,
+                 username: str = "erosion_fake"):
+        """
+        Args:
+            latency: Seconds each request takes
+            jitter: Extra random latency, up to this many seconds
+            rate_limit: Requests allowed per window before 429s start
+            window: Length of a rate-limit window in seconds
+            duplicate_window: How many recent texts count as duplicates
+            clock: SystemClock (default) or FakeClock for deterministic runs
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.window = window
+        self.clock = clock or SystemClock()
+        self.username = username
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._window_start = None
+        self._window_count = 0
+        self._recent_texts = deque(maxlen=duplicate_window)
+        self._next_id = 1_000_000_000_000_000_000
+
+        # Everything that was accepted: id -> {"text", "in_reply_to", "posted_at"}
+        self.tweets = {}
+        self.requests = 0
+        self.rate_limited = 0
+        self.duplicates = 0
+
+    def delay(self) -> float:
+        """How long the next request takes"""
+        delay = self.latency
+        if self.jitter:
+            with self._lock:
+                delay += self._rng.uniform(0, self.jitter)
+        return delay
+
+    def create_tweet(self, text: str, in_reply_to_tweet_id: Optional[str] = None) -> Optional[str]:
+        self.clock.sleep(self.delay())
+        return self.accept(text, in_reply_to_tweet_id)
+
+    def accept(self, text: str, in_reply_to_tweet_id: Optional[str] = None) -> str:
+        """Server-side handling of a request that has already arrived"""
+        with self._lock:
+            self.requests += 1
+            now = self.clock.time()
+
+            if self._window_start is None or now >= self._window_start + self.window:
+                self._window_start = now
+                self._window_count = 0
+
+            if self._window_count >= self.rate_limit:
+                self.rate_limited += 1
+                raise RateLimitError("429 Too Many Requests", reset_at=self._window_start + self.window)
+            self._window_count += 1
+
+            if text in self._recent_texts:
+                self.duplicates += 1
+                raise DuplicateTweetError("403 Forbidden: You are not allowed to create a Tweet with duplicate content.")
+            self._recent_texts.append(text)
+
+            self._next_id += self._rng.randint(1, 4096)
+            tweet_id = str(self._next_id)
+            self.tweets[tweet_id] = {
+                "text": text,
+                "in_reply_to": in_reply_to_tweet_id,
+                "posted_at": now
+            }
+            return tweet_id
+
+    def get_username(self) -> Optional[str]:
+        self.clock.sleep(self.delay())
+        return self.username
+
+    def remaining(self) -> int:
+        """Requests left in the current window"""
+        with self._lock:
+            if self._window_start is None or self.clock.time() >= self._window_start + self.window:
+                return self.rate_limit
+            return self.rate_limit - self._window_count
+
+
+class AsyncFakeTwitterBackend(AsyncTwitterBackend):
+    def __init__(self, fake: Optional[FakeTwitterBackend] = None, **kwargs):
+        """Async view of a FakeTwitterBackend; latency is awaited, not blocked on"""
+        self.fake = fake or FakeTwitterBackend(**kwargs)
+
+    async def create_tweet(self, text: str, in_reply_to_tweet_id: Optional[str] = None) -> Optional[str]:
+        delay = self.fake.delay()
+        if isinstance(self.fake.clock, FakeClock):
+            self.fake.clock.sleep(delay)
+            await asyncio.sleep(0)
+        else:
+            await asyncio.sleep(delay)
+        return self.fake.accept(text, in_reply_to_tweet_id)
+
+    async def close(self):
+        pass
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Git Reader for Erosion Broadcaster
+Keeps long-lived git pipes open so many commits can be read without
+forking a new git process for each one.
+"""
+
+import subprocess
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+from metrics import METRICS
+
+# Field separator for streamed `git log` output
+FIELD_SEP = "\x1f"
+LOG_FORMAT = f"%H{FIELD_SEP}%s{FIELD_SEP}%ai"
+
+
+class GitObjectReader:
+    def __init__(self, repo_path):
+        """Bind to a repository; processes are started on first use"""
+        self.repo_path = Path(repo_path)
+        self._batch = None
+        self._check = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _ensure_batch(self):
+        """Start (or restart) the persistent `git cat-file --batch` process"""
+        if self._batch is None or self._batch.poll() is not None:
+            METRICS.incr("subprocess_calls")
+            self._batch = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        return self._batch
+
+    def _ensure_check(self):
+        """Start (or restart) the persistent `git cat-file --batch-check` process"""
+        if self._check is None or self._check.poll() is not None:
+            METRICS.incr("subprocess_calls")
+            self._check = subprocess.Popen(
+                ["git", "cat-file", "--batch-check"],
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        return self._check
+
+    def close(self):
+        """Shut down the long-lived cat-file processes"""
+        for proc in (self._batch, self._check):
+            if proc is None:
+                continue
+            try:
+                proc.stdin.close()
+                proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                proc.kill()
+        self._batch = None
+        self._check = None
+
+    def object_info(self, spec: str) -> Optional[tuple]:
+        """(sha, type, size) for a spec such as "<commit>:erosion.py", without reading its contents"""
+        proc = self._ensure_check()
+        proc.stdin.write(spec.encode() + b"\n")
+        proc.stdin.flush()
+
+        header = proc.stdout.readline().split()
+        if len(header) != 3:
+            return None
+        return header[0].decode(), header[1].decode(), int(header[2])
+
+    def resolve(self, spec: str) -> Optional[str]:
+        """Object SHA for a spec, without reading its contents"""
+        info = self.object_info(spec)
+        return info[0] if info else None
+
+    def resolve_many(self, specs: Iterable[str], chunk: int = 256) -> List[Optional[str]]:
+        """
+        Object SHAs for many specs, in order, over the shared batch-check pipe
+
+        Specs are written a chunk at a time and the answers read back
+        together, so a whole range costs one round trip per chunk instead
+        of one per spec. Chunks stay well inside the pipe buffers.
+        """
+        specs = list(specs)
+        if specs:
+            METRICS.incr("git_batch_resolves")
+        proc = self._ensure_check()
+        shas = []
+        for start in range(0, len(specs), chunk):
+            part = specs[start:start + chunk]
+            proc.stdin.write(b"".join(spec.encode() + b"\n" for spec in part))
+            proc.stdin.flush()
+            for _ in part:
+                header = proc.stdout.readline().split()
+                shas.append(header[0].decode() if len(header) == 3 else None)
+        return shas
+
+    def read_object(self, spec: str) -> Optional[tuple]:
+        """
+        Read any object over the shared pipe
+
+        Args:
+            spec: Anything `git cat-file` understands, e.g. "<commit>:erosion.py"
+
+        Returns:
+            (sha, type, data) if the object exists, None otherwise
+        """
+        METRICS.incr("git_object_reads")
+        proc = self._ensure_batch()
+        proc.stdin.write(spec.encode() + b"\n")
+        proc.stdin.flush()
+
+        header = proc.stdout.readline().split()
+        if len(header) != 3:
+            # "<spec> missing" or "<spec> ambiguous"
+            return None
+
+        sha, obj_type, size = header
+        data = proc.stdout.read(int(size))
+        proc.stdout.read(1)  # trailing newline after the object body
+        return sha.decode(), obj_type.decode(), data
+
+    # Past this many unread bytes, restarting cat-file is cheaper than draining it
+    MAX_DRAIN = 1 << 20
+
+    def iter_object_chunks(self, spec: str, chunk_size: int = 1 << 16,
+                           max_bytes: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Stream an object's contents over the shared pipe, a chunk at a time,
+        so memory stays bounded however large the object is
+
+        At most max_bytes are yielded. Whatever is left unread is drained
+        (or the process restarted) so the pipe stays in step for the next
+        request. Yields nothing if the object doesn't exist.
+        """
+        METRICS.incr("git_object_reads")
+        proc = self._ensure_batch()
+        proc.stdin.write(spec.encode() + b"\n")
+        proc.stdin.flush()
+
+        header = proc.stdout.readline().split()
+        if len(header) != 3:
+            return
+
+        remaining = int(header[2])
+        budget = remaining if max_bytes is None else min(remaining, max_bytes)
+        try:
+            while budget > 0:
+                data = proc.stdout.read(min(chunk_size, budget))
+                if not data:
+                    return
+                remaining -= len(data)
+                budget -= len(data)
+                yield data
+        finally:
+            if remaining > self.MAX_DRAIN:
+                # Don't pull hundreds of MB through the pipe just to drop them
+                proc.kill()
+                proc.stdin.close()
+                proc.stdout.close()
+                proc.wait()
+                self._batch = None
+            else:
+                while remaining > 0:
+                    data = proc.stdout.read(min(chunk_size, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                proc.stdout.read(1)  # trailing newline after the object body
+
+    def read_blob(self, commit_hash: str, path: str) -> Optional[tuple]:
+        """Return (blob_sha, text) for a file at a commit, or None"""
+        obj = self.read_object(f"{commit_hash}:{path}")
+        if obj is None or obj[1] != "blob":
+            return None
+        sha, _, data = obj
+        return sha, data.decode("utf-8", errors="replace")
+
+    def is_ancestor(self, commit_hash: str, descendant: str = "HEAD") -> bool:
+        """True if commit_hash exists and is reachable from descendant"""
+        METRICS.incr("subprocess_calls")
+        result = subprocess.run(
+            ["git", "merge-base", "--is-ancestor", commit_hash, descendant],
+            cwd=self.repo_path,
+            capture_output=True
+        )
+        return result.returncode == 0
+
+    def iter_log(self, rev_range: Optional[str] = None,
+                 max_count: Optional[int] = None,
+                 reverse: bool = False) -> Iterator[dict]:
+        """Stream commit metadata (newest first unless reversed) without buffering the whole log"""
+        cmd = ["git", "log", f"--pretty=format:{LOG_FORMAT}"]
+        if max_count is not None:
+            cmd.append(f"--max-count={max_count}")
+        if reverse:
+            cmd.append("--reverse")
+        if rev_range:
+            cmd.append(rev_range)
+
+        METRICS.incr("subprocess_calls")
+        proc = subprocess.Popen(
+            cmd,
+            cwd=self.repo_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        )
+        try:
+            for line in proc.stdout:
+                line = line.rstrip("\n")
+                if not line:
+                    continue
+                hash_val, message, date = line.split(FIELD_SEP, 2)
+                yield {
+                    "hash": hash_val,
+                    "message": message,
+                    "date": date
+                }
+        finally:
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+
+    def iter_diffs(self, commit_hashes: Iterable[str], path: str) -> Iterator[tuple]:
+        """
+        Stream (commit_hash, diff_text) pairs for many commits from one
+        `git diff-tree --stdin` process
+
+        Commits that don't touch the path are yielded with an empty diff.
+        """
+        METRICS.incr("subprocess_calls")
+        proc = subprocess.Popen(
+            ["git", "diff-tree", "--stdin", "-p", "--", path],
+            cwd=self.repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+        requested = []
+
+        def feed():
+            # Write from a thread so a large batch can't deadlock on the pipe
+            try:
+                for commit_hash in commit_hashes:
+                    requested.append(commit_hash)
+                    proc.stdin.write(commit_hash.encode() + b"\n")
+                proc.stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+
+        writer = threading.Thread(target=feed, daemon=True)
+        writer.start()
+
+        # diff-tree echoes each input commit on its own line before its patch
+        current, chunk, emitted = None, [], set()
+        try:
+            for raw in proc.stdout:
+                line = raw.decode("utf-8", errors="replace")
+                stripped = line.rstrip("\n")
+                if len(stripped) == 40 and all(c in "0123456789abcdef" for c in stripped):
+                    if current is not None:
+                        emitted.add(current)
+                        yield current, "".join(chunk)
+                    current, chunk = stripped, []
+                else:
+                    chunk.append(line)
+            if current is not None:
+                emitted.add(current)
+                yield current, "".join(chunk)
+        finally:
+            proc.stdout.close()
+            if proc.poll() is None and writer.is_alive():
+                # Stopped early; unblock the writer by ending git
+                proc.kill()
+            writer.join()
+            proc.wait()
+
+        # Commits with no changes to the path produce no output at all
+        for commit_hash in requested:
+            if commit_hash not in emitted:
+                yield commit_hash, ""
+
+    def diff(self, commit_hash: str, path: str) -> str:
+        """Diff of a single commit against its parent, limited to one path"""
+        for _, diff_text in self.iter_diffs([commit_hash], path):
+            return diff_text
+        return ""
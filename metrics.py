@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Metrics for Erosion Broadcaster
+Per-stage timers and counters for one run, exported at the end as a JSON
+line and as a Prometheus textfile (for node_exporter's textfile collector).
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from state_store import write_atomic
+
+PREFIX = "erosion_broadcaster"
+
+
+class Metrics:
+    def __init__(self):
+        """An empty registry; stages and counters appear as they are used"""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            # stage -> [total seconds, times entered]
+            self.stages = {}
+            self.counters = {}
+
+    def stage(self, name: str) -> "StageTimer":
+        """Time a block of work; re-entering a stage adds to its total"""
+        return StageTimer(self, name)
+
+    def add_time(self, name: str, elapsed: float):
+        with self._lock:
+            totals = self.stages.setdefault(name, [0.0, 0])
+            totals[0] += elapsed
+            totals[1] += 1
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self, **extra) -> dict:
+        """This run's numbers as plain data"""
+        with self._lock:
+            return {
+                "started_at": self.started,
+                "duration": time.time() - self.started,
+                **extra,
+                "stages": {name: {"seconds": round(total, 6), "count": count}
+                           for name, (total, count) in sorted(self.stages.items())},
+                "counters": dict(sorted(self.counters.items()))
+            }
+
+    def write_jsonl(self, path, **extra):
+        """Append this run as one JSON line"""
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.snapshot(**extra)) + "\n")
+
+    def write_prometheus(self, path, **labels):
+        """Replace path with this run's numbers in the Prometheus text format"""
+        snap = self.snapshot()
+        extra = "".join(f',{k}="{v}"' for k, v in sorted(labels.items()))
+        base = "{" + extra[1:] + "}" if extra else ""
+
+        lines = [
+            f"# HELP {PREFIX}_last_run_timestamp_seconds When the last run started",
+            f"# TYPE {PREFIX}_last_run_timestamp_seconds gauge",
+            f"{PREFIX}_last_run_timestamp_seconds{base} {snap['started_at']:.3f}",
+            f"# HELP {PREFIX}_run_duration_seconds Wall time of the last run",
+            f"# TYPE {PREFIX}_run_duration_seconds gauge",
+            f"{PREFIX}_run_duration_seconds{base} {snap['duration']:.6f}",
+            f"# HELP {PREFIX}_stage_seconds Time spent in each stage during the last run",
+            f"# TYPE {PREFIX}_stage_seconds gauge",
+        ]
+        for name, stage in snap["stages"].items():
+            lines.append(f'{PREFIX}_stage_seconds{{stage="{name}"{extra}}} {stage["seconds"]:.6f}')
+        lines += [
+            f"# HELP {PREFIX}_stage_count Times each stage ran during the last run",
+            f"# TYPE {PREFIX}_stage_count gauge",
+        ]
+        for name, stage in snap["stages"].items():
+            lines.append(f'{PREFIX}_stage_count{{stage="{name}"{extra}}} {stage["count"]}')
+        for name, value in snap["counters"].items():
+            lines += [
+                f"# TYPE {PREFIX}_{name} gauge",
+                f"{PREFIX}_{name}{base} {value}",
+            ]
+
+        # Write then rename, so the collector never reads half a file
+        path = Path(path)
+        write_atomic(path, "\n".join(lines) + "\n")
+
+    def summary(self) -> str:
+        """One line per stage, slowest first, for the end of a run"""
+        snap = self.snapshot()
+        stages = sorted(snap["stages"].items(), key=lambda item: -item[1]["seconds"])
+        lines = [f"  {name:<12} {stage['seconds']:8.3f}s  x{stage['count']}" for name, stage in stages]
+        if snap["counters"]:
+            lines.append("  " + ", ".join(f"{k}={v}" for k, v in snap["counters"].items()))
+        return "\n".join(lines)
+
+
+class StageTimer:
+    """Context manager behind Metrics.stage; a plain class is cheaper than a generator on hot paths"""
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics: Metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+
+# Shared by every module in the process
+METRICS = Metrics()
+
+
+@contextmanager
+def profiled(path, top: int = 20):
+    """Run a block under cProfile, save the stats to path and print the hot spots"""
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"✓ Profile written to {path}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Outbox for Erosion Broadcaster
+A durable queue of rendered tweets, drained at whatever rate the API allows.
+A tweet that hits a rate limit stays queued instead of being lost.
+"""
+
+import random
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+from metrics import METRICS
+from state_store import append_journal, read_journal, rewrite_journal
+from twitter_integration import DuplicateTweetError, ForbiddenError, RateLimitError
+
+PENDING = "pending"
+POSTED = "posted"
+FAILED = "failed"
+
+
+class Outbox:
+    def __init__(self, path):
+        """
+        Open the outbox stored at path
+
+        The file is append-only JSON lines; each line updates one commit's
+        record, and the last line for a commit wins.
+        """
+        self.path = Path(path)
+        self.records = OrderedDict()
+        self._appended = 0
+        self.load()
+
+    def load(self):
+        """Replay the journal into one record per commit"""
+        self.records = OrderedDict()
+        events, torn = read_journal(self.path)
+        for event in events:
+            self.records.setdefault(event["commit"], {}).update(event)
+        if torn:
+            # Rewrite now, or the next append would be glued onto the torn line
+            self.compact()
+
+    def _append(self, event: dict):
+        append_journal(self.path, event)
+        self.records.setdefault(event["commit"], {}).update(event)
+        self._appended += 1
+
+    def __contains__(self, commit_hash):
+        return commit_hash in self.records
+
+    def enqueue(self, commit_hash: str, text: str, **meta) -> bool:
+        """Queue a tweet for a commit; False if that commit was already queued"""
+        if commit_hash in self.records:
+            return False
+        self._append({
+            "commit": commit_hash,
+            "text": text,
+            "status": PENDING,
+            "attempts": 0,
+            "queued_at": time.time(),
+            **meta
+        })
+        return True
+
+    def pending(self) -> List[dict]:
+        """Queued tweets in the order they were added"""
+        return [dict(r) for r in self.records.values() if r.get("status") == PENDING]
+
+    def mark_attempt(self, commit_hash: str, error: str, counts: bool = True):
+        """Record a failed try; rate-limit waits don't count towards giving up"""
+        attempts = self.records[commit_hash].get("attempts", 0) + (1 if counts else 0)
+        self._append({"commit": commit_hash, "attempts": attempts, "last_error": error})
+
+    def mark_posted(self, commit_hash: str, tweet_id: Optional[str]):
+        self._append({"commit": commit_hash, "status": POSTED, "tweet_id": tweet_id,
+                      "posted_at": time.time()})
+
+    def mark_failed(self, commit_hash: str, error: str):
+        self._append({"commit": commit_hash, "status": FAILED, "last_error": error})
+
+    def compact_if_needed(self, threshold: int = 64):
+        """Compact once enough updates have piled up since the last rewrite"""
+        if self._appended > threshold:
+            self.compact()
+
+    def compact(self, keep_settled: int = 1000):
+        """
+        Rewrite the journal as one line per commit
+
+        Only the newest keep_settled posted or failed records are kept, so a
+        long-running process doesn't grow without bound; the state journal
+        already remembers every commit that was tweeted.
+        """
+        settled = [h for h, r in self.records.items() if r.get("status") != PENDING]
+        for commit_hash in settled[:max(len(settled) - keep_settled, 0)]:
+            del self.records[commit_hash]
+        rewrite_journal(self.path, self.records.values())
+        self._appended = 0
+
+
+class OutboxScheduler:
+    def __init__(self, outbox: Outbox, poster, max_wait: float = 900.0,
+                 base_delay: float = 2.0, max_delay: float = 300.0,
+                 max_attempts: int = 8, now=time.time, sleep=time.sleep, rng=None,
+                 on_posted=None, stop=None, label=None):
+        """
+        Drains an outbox through a TwitterPoster
+
+        Args:
+            max_wait: Longest single pause (rate-limit reset or backoff) worth
+                waiting for in this run; anything longer is left for the next run
+            base_delay, max_delay: Exponential backoff bounds for transient errors
+            max_attempts: Transient failures before a tweet is given up on
+            now, sleep: Clock hooks, e.g. a FakeClock's time/sleep in benchmarks
+            on_posted: Called with (commit_hash, tweet_id) once a tweet is out
+            stop: threading.Event; once set, pauses end early and draining stops
+            label: Destination named in the log; None logs Twitter status links
+        """
+        self.outbox = outbox
+        self.poster = poster
+        self.max_wait = max_wait
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.now = now
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.on_posted = on_posted
+        self.stop = stop
+        self.label = label
+
+        self.posted = 0
+        self.retries = 0
+        self.rate_limit_waits = 0
+        self.waited = 0.0
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _pause(self, seconds: float) -> bool:
+        """Wait if it's worth it this run; False means stop draining"""
+        if seconds > self.max_wait:
+            print(f"⚠ Next attempt is {seconds:.0f}s away, leaving the rest of the outbox for a later run")
+            return False
+        if self.stop is not None:
+            # Shutting down: the wait is cut short and the rest stays queued
+            if self.stop.wait(seconds):
+                return False
+        else:
+            self.sleep(seconds)
+        self.waited += seconds
+        METRICS.incr("post_wait_seconds", seconds)
+        return True
+
+    def run(self, limit: Optional[int] = None) -> int:
+        """Post queued tweets oldest first; returns how many were posted"""
+        for record in self.outbox.pending():
+            if limit is not None and self.posted >= limit:
+                break
+            if self.stop is not None and self.stop.is_set():
+                break
+            if not self._post(record):
+                break
+
+        self.outbox.compact_if_needed()
+        return self.posted
+
+    def _post(self, record) -> bool:
+        """Post one queued tweet, retrying as allowed; False means stop draining"""
+        commit_hash = record["commit"]
+        attempt = record.get("attempts", 0)
+
+        while True:
+            try:
+                tweet_id = self.poster.send(record["text"], key=commit_hash)
+                if not tweet_id:
+                    raise RuntimeError("no response data")
+            except RateLimitError as e:
+                self.rate_limit_waits += 1
+                METRICS.incr("rate_limit_waits")
+                self.outbox.mark_attempt(commit_hash, "rate limited", counts=False)
+                # Respect the API's reset time; fall back to backoff if it gave none
+                wait = e.reset_at - self.now() if e.reset_at else self.backoff(attempt)
+                if not self._pause(max(wait, 0) + self.rng.uniform(0, 1)):
+                    return False
+                continue
+            except DuplicateTweetError:
+                # Already on the timeline, most likely from a run that died before recording it
+                print(f"⚠ Tweet for {commit_hash[:7]} was already posted")
+                self.outbox.mark_posted(commit_hash, None)
+                if self.on_posted:
+                    self.on_posted(commit_hash, None)
+                return True
+            except ForbiddenError as e:
+                print(f"⚠ Forbidden, dropping tweet for {commit_hash[:7]}: {e}")
+                self.outbox.mark_failed(commit_hash, str(e))
+                METRICS.incr("posts_failed")
+                return True
+            except Exception as e:
+                attempt += 1
+                self.retries += 1
+                METRICS.incr("post_retries")
+                self.outbox.mark_attempt(commit_hash, str(e))
+                if attempt >= self.max_attempts:
+                    print(f"⚠ Giving up on tweet for {commit_hash[:7]} after {attempt} attempts: {e}")
+                    self.outbox.mark_failed(commit_hash, str(e))
+                    METRICS.incr("posts_failed")
+                    return True
+                print(f"⚠ Failed to post tweet for {commit_hash[:7]} ({e}), retrying")
+                if not self._pause(self.backoff(attempt)):
+                    return False
+                continue
+
+            self.outbox.mark_posted(commit_hash, tweet_id)
+            if self.on_posted:
+                self.on_posted(commit_hash, tweet_id)
+            self.posted += 1
+            METRICS.incr("posts")
+            if self.label:
+                print(f"✓ Posted to {self.label}: {tweet_id}")
+            else:
+                print(f"✓ Tweet posted successfully: https://twitter.com/i/web/status/{tweet_id}")
+            return True
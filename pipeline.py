@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Candidate Pipeline for Erosion Broadcaster
+Streams pending commits through cheap scoring, a bounded shortlist and
+lazy rendering, and picks the most interesting tweets of the run instead
+of whichever commit happens to be newest.
+"""
+
+import heapq
+import re
+from collections import namedtuple
+from typing import Iterable, Iterator, List, Optional
+
+from metrics import METRICS
+
+# weight: how much the scorer counts; score(candidate) -> 0.0 .. 1.0;
+# needs_tweet: the scorer looks at rendered text, so it runs after rendering
+Scorer = namedtuple("Scorer", ["name", "weight", "score", "needs_tweet"])
+
+MILESTONES = {1, 10, 50, 100, 500, 1000}
+ITERATION_PATTERN = re.compile(r'iteration (\d+)')
+
+
+class Candidate:
+    __slots__ = ("commit", "order", "stats", "iteration", "prescore", "tweet", "score")
+
+    def __init__(self, commit: dict, order: int, stats: Optional[dict]):
+        """A commit on its way to becoming a tweet; order 0 is the newest"""
+        self.commit = commit
+        self.order = order
+        self.stats = stats or {}
+        match = ITERATION_PATTERN.search(commit['message'])
+        self.iteration = int(match.group(1)) if match else None
+        self.prescore = 0.0
+        self.tweet = None
+        self.score = 0.0
+
+
+def corruption_density(candidate: Candidate) -> float:
+    """How marked the file is at this commit; saturates as corruption piles up"""
+    score = candidate.stats.get("corruption_score") or 0
+    return score / (score + 100.0)
+
+
+def worst_line(candidate: Candidate) -> float:
+    """How mangled the single worst line is"""
+    best = candidate.stats.get("best_score") or 0
+    return best / (best + 5.0)
+
+
+def milestone(candidate: Candidate) -> float:
+    iteration = candidate.iteration
+    return 1.0 if iteration and (iteration in MILESTONES or iteration % 100 == 0) else 0.0
+
+
+def restoration(candidate: Candidate) -> float:
+    return 1.0 if "RESTORATION" in candidate.commit['message'] else 0.0
+
+
+def length_fit(candidate: Candidate, target: int = 200) -> float:
+    """Tweets that use the space without crowding the limit read best"""
+    length = len(candidate.tweet or "")
+    if length == 0 or length > 280:
+        return 0.0
+    return max(0.0, 1.0 - abs(length - target) / target)
+
+
+DEFAULT_SCORERS = [
+    Scorer("restoration", 10.0, restoration, False),
+    Scorer("milestone", 3.0, milestone, False),
+    Scorer("corruption_density", 2.0, corruption_density, False),
+    Scorer("worst_line", 1.0, worst_line, False),
+    Scorer("length_fit", 1.0, length_fit, True),
+]
+
+
+class CandidatePipeline:
+    def __init__(self, broadcaster, scorers: Optional[List[Scorer]] = None,
+                 k: int = 1, shortlist: int = 16):
+        """
+        Args:
+            broadcaster: ErosionBroadcaster supplying commits, stats and rendering
+            scorers: Weighted scorers; defaults to DEFAULT_SCORERS
+            k: How many tweets to pick
+            shortlist: Commits kept (by pre-render score) as rendering candidates
+        """
+        self.broadcaster = broadcaster
+        scorers = DEFAULT_SCORERS if scorers is None else scorers
+        self.cheap = [s for s in scorers if not s.needs_tweet]
+        self.rendered = [s for s in scorers if s.needs_tweet]
+        # The most a render can add, since every scorer returns at most 1
+        self.render_bonus = sum(s.weight for s in self.rendered)
+        self.k = k
+        self.shortlist_size = max(shortlist, k)
+
+    def iter_commits(self) -> Iterator[dict]:
+        """Pending commits that are eligible at all"""
+        for commit in self.broadcaster.iter_pending_commits():
+            METRICS.incr("commits_considered")
+            if self.broadcaster.should_tweet(commit):
+                yield commit
+
+    def iter_candidates(self, commits: Iterable[dict]) -> Iterator[Candidate]:
+        """Attach indexed corruption stats and the pre-render score"""
+        index = self.broadcaster.index
+        for order, commit in enumerate(commits):
+            candidate = Candidate(commit, order, index.commit_stats(commit['hash']))
+            candidate.prescore = sum(s.weight * s.score(candidate) for s in self.cheap)
+            yield candidate
+
+    def shortlist(self, candidates: Iterable[Candidate]) -> List[Candidate]:
+        """Best pre-render scores, newest first on ties, kept in a bounded heap"""
+        return heapq.nlargest(self.shortlist_size, candidates, key=lambda c: (c.prescore, -c.order))
+
+    def iter_rendered(self, shortlisted: List[Candidate]) -> Iterator[Candidate]:
+        """Render in shortlist order; the caller stops pulling once nothing left can win"""
+        for candidate in shortlisted:
+            with METRICS.stage("render"):
+                candidate.tweet = self.broadcaster.generate_tweet(candidate.commit)
+            METRICS.incr("candidates_rendered")
+            candidate.score = candidate.prescore + sum(s.weight * s.score(candidate) for s in self.rendered)
+            yield candidate
+
+    def select(self) -> List[Candidate]:
+        """The top-k candidates of this run, best first"""
+        shortlisted = self.shortlist(self.iter_candidates(self.iter_commits()))
+        # One batched blob lookup for everything that might be rendered
+        self.broadcaster.resolve_blobs(c.commit['hash'] for c in shortlisted)
+
+        best = []  # min-heap of (score, -order, candidate), at most k long
+        rendered = self.iter_rendered(shortlisted)
+        for position, upcoming in enumerate(shortlisted):
+            # Rendering can't lift anyone past this bound, so stop before rendering more
+            if len(best) == self.k and upcoming.prescore + self.render_bonus <= best[0][0]:
+                break
+            candidate = next(rendered)
+            entry = (candidate.score, -candidate.order, position, candidate)
+            if len(best) < self.k:
+                heapq.heappush(best, entry)
+            else:
+                heapq.heappushpop(best, entry)
+
+        return [entry[-1] for entry in sorted(best, reverse=True)]
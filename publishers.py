@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Publishers for Erosion Broadcaster
+Mirrors every rendered tweet to several destinations (Twitter, Mastodon,
+Bluesky, a local archive). Each destination gets a variant formatted for
+its own length limit, and drains its own outbox with its own retries and
+rate budget on its own thread, so a slow one never holds up the rest.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from metrics import METRICS
+from outbox import OutboxScheduler
+from twitter_integration import (DuplicateTweetError, ForbiddenError, RateLimitError,
+                                 load_local_env)
+
+# name: used for its outbox file and in logs; poster: anything with
+# connected/send(text, key=commit hash); limit: longest text it accepts (None for no limit);
+# budget: RateBudget its sends are paid from, or None
+Destination = namedtuple("Destination", ["name", "poster", "limit", "budget"])
+
+
+class RateBudget:
+    def __init__(self, posts: int, window: float, now=time.time, sleep=time.sleep):
+        """Token bucket: posts per window seconds, shareable between threads"""
+        self.capacity = posts
+        self.rate = posts / window
+        self.tokens = float(posts)
+        self.now = now
+        self.sleep = sleep
+        self._updated = now()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        current = self.now()
+        self.tokens = min(self.capacity, self.tokens + (current - self._updated) * self.rate)
+        self._updated = current
+
+    def acquire(self, max_wait: float = 0.0) -> Optional[float]:
+        """
+        Take one post from the budget, waiting up to max_wait seconds
+
+        Returns None on success, or the epoch time the next post frees up.
+        """
+        deadline = self.now() + max_wait
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return None
+                ready_at = self.now() + (1 - self.tokens) / self.rate
+            if ready_at > deadline:
+                return ready_at
+            self.sleep(ready_at - self.now())
+
+
+class BudgetedPoster:
+    def __init__(self, poster, budget: RateBudget, max_wait: float = 60.0):
+        """A poster whose sends are paid for from a RateBudget"""
+        self.poster = poster
+        self.budget = budget
+        self.max_wait = max_wait
+
+    @property
+    def connected(self) -> bool:
+        return self.poster.connected
+
+    def send(self, text: str, in_reply_to_tweet_id: Optional[str] = None,
+             key: Optional[str] = None) -> Optional[str]:
+        ready_at = self.budget.acquire(self.max_wait)
+        if ready_at is not None:
+            # Surfaces to the outbox scheduler exactly like an API 429
+            raise RateLimitError("Post budget exhausted", reset_at=ready_at)
+        return self.poster.send(text, in_reply_to_tweet_id=in_reply_to_tweet_id, key=key)
+
+
+def fit_text(text: str, limit: Optional[int]) -> str:
+    """Make a tweet fit a platform: drop trailing hashtags first, then truncate"""
+    if limit is None or len(text) <= limit:
+        return text
+    body, _, last = text.rpartition("\n")
+    if body and last.startswith("#") and len(body.rstrip()) <= limit:
+        return body.rstrip()
+    return text[:limit - 3] + "..."
+
+
+class HttpPoster:
+    """JSON over HTTP with the same errors TwitterBackend raises"""
+    timeout = 30.0
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self._connected = None
+
+    @property
+    def connected(self) -> bool:
+        """Whether posting can work; checked once, on first use"""
+        if self._connected is None:
+            try:
+                self._connected = self.verify()
+            except Exception as e:
+                print(f"⚠ {type(self).__name__} connection failed: {e}")
+                self._connected = False
+        return self._connected
+
+    def recheck(self):
+        """Forget a failed connection check, so the next use tries again"""
+        if self._connected is False:
+            self._connected = None
+
+    def verify(self) -> bool:
+        raise NotImplementedError
+
+    def reset_at(self, headers) -> Optional[float]:
+        """Epoch seconds when a 429 lifts, from the response headers"""
+        return None
+
+    def _request(self, method: str, path: str, body: Optional[dict] = None,
+                 headers: Optional[dict] = None) -> dict:
+        # Imported here so runs without mirrors never pay for urllib's import
+        import urllib.error
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.base_url + path, method=method,
+            data=json.dumps(body).encode() if body is not None else None,
+            headers={"Content-Type": "application/json", **(headers or {})})
+        METRICS.incr("api_requests")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode("utf-8", errors="replace")
+            if e.code == 429:
+                raise RateLimitError(detail or "Rate limit exceeded", reset_at=self.reset_at(e.headers)) from e
+            if "duplicate" in detail.lower():
+                raise DuplicateTweetError(detail) from e
+            if e.code == 401:
+                # Revoked or stale credentials: keep the post queued and check the
+                # connection again on the next run (see recheck) instead of dropping it
+                self._connected = False
+            elif e.code in (400, 403, 422) and "ExpiredToken" not in detail:
+                raise ForbiddenError(f"HTTP {e.code}: {detail}") from e
+            # Anything else (5xx, an expired session) is worth retrying
+            raise RuntimeError(f"HTTP {e.code}: {detail}") from e
+
+
+class MastodonPoster(HttpPoster):
+    def __init__(self, base_url: str, access_token: str, visibility: str = "public"):
+        """Statuses on a Mastodon-compatible server"""
+        super().__init__(base_url)
+        self.access_token = access_token
+        self.visibility = visibility
+
+    def _auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+    def verify(self) -> bool:
+        account = self._request("GET", "/api/v1/accounts/verify_credentials", headers=self._auth())
+        print(f"Authenticated on Mastodon as: @{account.get('acct')}")
+        return True
+
+    def reset_at(self, headers) -> Optional[float]:
+        reset = headers.get("X-RateLimit-Reset")
+        if not reset:
+            return None
+        return datetime.fromisoformat(reset.replace("Z", "+00:00")).timestamp()
+
+    def send(self, text: str, in_reply_to_tweet_id: Optional[str] = None,
+             key: Optional[str] = None) -> Optional[str]:
+        body = {"status": text, "visibility": self.visibility}
+        if in_reply_to_tweet_id:
+            body["in_reply_to_id"] = in_reply_to_tweet_id
+        # The server answers a retried request with the status it already made;
+        # keyed on the commit, so a re-rendered variant of it isn't posted twice
+        key = key or hashlib.sha256(text.encode()).hexdigest()[:32]
+        status = self._request("POST", "/api/v1/statuses", body,
+                               headers={**self._auth(), "Idempotency-Key": key})
+        return status.get("id")
+
+
+class BlueskyPoster(HttpPoster):
+    def __init__(self, base_url: str, handle: str, app_password: str):
+        """Posts on an AT Protocol PDS, such as https://bsky.social"""
+        super().__init__(base_url)
+        self.handle = handle
+        self.app_password = app_password
+        self._session = None
+
+    def verify(self) -> bool:
+        self._login()
+        print(f"Authenticated on Bluesky as: @{self._session['handle']}")
+        return True
+
+    def _login(self):
+        self._session = self._request("POST", "/xrpc/com.atproto.server.createSession",
+                                      {"identifier": self.handle, "password": self.app_password})
+
+    def reset_at(self, headers) -> Optional[float]:
+        reset = headers.get("ratelimit-reset")
+        return float(reset) if reset else None
+
+    def send(self, text: str, in_reply_to_tweet_id: Optional[str] = None,
+             key: Optional[str] = None) -> Optional[str]:
+        if self._session is None:
+            self._login()
+        record = {"$type": "app.bsky.feed.post", "text": text,
+                  "createdAt": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")}
+        try:
+            created = self._request(
+                "POST", "/xrpc/com.atproto.repo.createRecord",
+                {"repo": self._session["did"], "collection": "app.bsky.feed.post", "record": record},
+                headers={"Authorization": f"Bearer {self._session['accessJwt']}"})
+        except RuntimeError as e:
+            if "ExpiredToken" in str(e) or "HTTP 401" in str(e):
+                # Log in again on the scheduler's retry
+                self._session = None
+            raise
+        return created.get("uri")
+
+
+class ArchivePoster:
+    def __init__(self, path):
+        """Appends every post to a local JSONL archive"""
+        self.path = Path(path)
+        self.connected = True
+
+    def send(self, text: str, in_reply_to_tweet_id: Optional[str] = None,
+             key: Optional[str] = None) -> Optional[str]:
+        post_id = hashlib.sha1(text.encode()).hexdigest()[:16]
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({"id": post_id, "text": text, "posted_at": time.time()},
+                               ensure_ascii=False) + "\n")
+        return post_id
+
+
+def destinations_from_env() -> List[Destination]:
+    """
+    Mirrors configured in the environment (or .env.local):
+    MASTODON_BASE_URL + MASTODON_ACCESS_TOKEN, BLUESKY_HANDLE +
+    BLUESKY_APP_PASSWORD (+ BLUESKY_PDS_URL), EROSION_ARCHIVE_FILE
+    """
+    load_local_env()
+    env = os.environ
+    destinations = []
+    if env.get("MASTODON_BASE_URL") and env.get("MASTODON_ACCESS_TOKEN"):
+        destinations.append(Destination(
+            "mastodon", MastodonPoster(env["MASTODON_BASE_URL"], env["MASTODON_ACCESS_TOKEN"]),
+            500, RateBudget(300, 3 * 3600)))
+    if env.get("BLUESKY_HANDLE") and env.get("BLUESKY_APP_PASSWORD"):
+        destinations.append(Destination(
+            "bluesky", BlueskyPoster(env.get("BLUESKY_PDS_URL", "https://bsky.social"),
+                                     env["BLUESKY_HANDLE"], env["BLUESKY_APP_PASSWORD"]),
+            300, RateBudget(1000, 3600)))
+    if env.get("EROSION_ARCHIVE_FILE"):
+        destinations.append(Destination("archive", ArchivePoster(env["EROSION_ARCHIVE_FILE"]), None, None))
+    return destinations
+
+
+class Publisher:
+    def __init__(self, destinations: List[Destination], outboxes: Dict[str, object], cache=None,
+                 clock=None):
+        """
+        Args:
+            destinations: Where every tweet goes
+            outboxes: Outbox per destination name
+            cache: SnippetCache that remembers formatted variants
+            clock: time()/sleep() for the outbox schedulers, e.g. a FakeClock in tests
+        """
+        self.destinations = destinations
+        self.outboxes = outboxes
+        self.cache = cache
+        self.clock = clock
+
+    def variant(self, commit_hash: str, text: str, destination: Destination) -> str:
+        """The text as posted to one destination, cached by commit, platform and limit"""
+        if self.cache is None:
+            return fit_text(text, destination.limit)
+        source = zlib.crc32(text.encode())
+        cached = self.cache.get_format(commit_hash, destination.name, destination.limit)
+        # A different rendering of the same commit (new seed salt) needs a new variant
+        if cached is not None and cached[0] == source:
+            return cached[1]
+        formatted = fit_text(text, destination.limit)
+        self.cache.put_format(commit_hash, destination.name, destination.limit, [source, formatted])
+        return formatted
+
+    def enqueue(self, commit_hash: str, text: str, **meta) -> bool:
+        """Queue a commit's tweet everywhere; False if every outbox already had it"""
+        queued = False
+        for destination in self.destinations:
+            variant = self.variant(commit_hash, text, destination)
+            queued |= self.outboxes[destination.name].enqueue(commit_hash, variant, **meta)
+        return queued
+
+    def pending(self) -> int:
+        return sum(len(outbox.pending()) for outbox in self.outboxes.values())
+
+    def _flush_one(self, destination: Destination, poster, stop, on_posted) -> int:
+        outbox = self.outboxes[destination.name]
+        queued = len(outbox.pending())
+        if not queued:
+            return 0
+        if poster is None or not poster.connected:
+            print(f"⚠ {destination.name} not connected, {queued} post(s) stay queued")
+            return 0
+        if destination.budget is not None:
+            poster = BudgetedPoster(poster, destination.budget)
+
+        clock = {"now": self.clock.time, "sleep": self.clock.sleep} if self.clock else {}
+        scheduler = OutboxScheduler(outbox, poster, on_posted=on_posted, stop=stop,
+                                    label=None if destination.name == "twitter" else destination.name,
+                                    **clock)
+        with METRICS.stage(f"post_{destination.name}"):
+            posted = scheduler.run()
+        print(f"✓ Outbox ({destination.name}): posted {posted}/{queued}, {scheduler.retries} retries, "
+              f"{scheduler.rate_limit_waits} rate-limit waits ({scheduler.waited:.0f}s)")
+        return posted
+
+    def _flush_guarded(self, destination: Destination, poster, stop, on_posted) -> int:
+        """_flush_one, except a destination that blows up only costs its own posts"""
+        try:
+            return self._flush_one(destination, poster, stop, on_posted)
+        except Exception as e:
+            print(f"⚠ {destination.name}: posting failed: {e}")
+            return 0
+
+    def flush(self, posters: Optional[dict] = None, stop=None, on_posted: Optional[dict] = None) -> Dict[str, int]:
+        """
+        Drain every destination's outbox at once, one thread each
+
+        Args:
+            posters: Per-destination poster overrides, e.g. a budgeted Twitter poster
+            stop: threading.Event that ends waits early (see OutboxScheduler)
+            on_posted: Per-destination callbacks for OutboxScheduler
+
+        Returns:
+            {destination name: posts made}
+        """
+        posters = posters or {}
+        on_posted = on_posted or {}
+        work = [d for d in self.destinations if self.outboxes[d.name].pending()]
+        if not work:
+            return {}
+        if len(work) == 1:
+            d = work[0]
+            return {d.name: self._flush_guarded(d, posters.get(d.name, d.poster), stop, on_posted.get(d.name))}
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=len(work)) as pool:
+            futures = {d.name: pool.submit(self._flush_guarded, d, posters.get(d.name, d.poster),
+                                           stop, on_posted.get(d.name))
+                       for d in work}
+            return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Snippet Cache for Erosion Broadcaster
+Remembers the analysis of each erosion.py blob by its SHA, so unchanged or
+restored files are never rescanned.
+"""
+
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from metrics import METRICS
+from state_store import write_atomic
+
+# Bump whenever the shape of cached entries changes; old caches are dropped
+SCHEMA_VERSION = 3
+
+
+class SnippetCache:
+    def __init__(self, path, max_entries: int = 2000):
+        """Open (or start) a size-bounded LRU cache stored at path"""
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """Read the cache file, ignoring it if it is unreadable or outdated"""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print(f"⚠ Ignoring unreadable snippet cache {self.path}")
+            return
+        if data.get("version") != SCHEMA_VERSION:
+            return
+        # Stored least recently used first
+        self.entries = OrderedDict(data.get("entries", []))
+
+    def save(self):
+        """Write the cache back if anything changed"""
+        if not self._dirty:
+            return
+        write_atomic(self.path, json.dumps({
+            "version": SCHEMA_VERSION,
+            "entries": list(self.entries.items())
+        }, separators=(',', ':')))
+        self._dirty = False
+
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            METRICS.incr("cache_misses")
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        METRICS.incr("cache_hits")
+        return entry
+
+    def _put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._dirty = True
+
+    def get_snippets(self, blob_sha: str) -> Optional[dict]:
+        """Corruption candidates for a blob: {"candidates": [[line_no, start, end], ...], "fallback": [[start, end], ...]}"""
+        return self._get(f"blob:{blob_sha}")
+
+    def put_snippets(self, blob_sha: str, entry: dict):
+        self._put(f"blob:{blob_sha}", entry)
+
+    def get_changes(self, old_sha: str, new_sha: str) -> Optional[list]:
+        """Changes between two blobs: [[removed, added, position, edit_distance], ...]"""
+        return self._get(f"diff:{old_sha}..{new_sha}")
+
+    def put_changes(self, old_sha: str, new_sha: str, changes: list):
+        self._put(f"diff:{old_sha}..{new_sha}", changes)
+
+    def get_stats(self, blob_sha: str) -> Optional[list]:
+        """Byte statistics of a blob, as the fields of blob_stats.BlobStats"""
+        return self._get(f"stats:{blob_sha}")
+
+    def put_stats(self, blob_sha: str, stats: list):
+        self._put(f"stats:{blob_sha}", stats)
+
+    def get_format(self, commit_hash: str, platform: str, limit) -> Optional[list]:
+        """A tweet formatted for one platform: [crc32 of the source text, formatted text]"""
+        return self._get(f"format:{platform}:{limit}:{commit_hash}")
+
+    def put_format(self, commit_hash: str, platform: str, limit, entry: list):
+        self._put(f"format:{platform}:{limit}:{commit_hash}", entry)
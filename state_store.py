@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+State Store for Erosion Broadcaster
+Crash-safe persistence: the small state snapshot is replaced atomically,
+and every tweeted commit goes into an append-only journal, so "already
+tweeted?" is a set lookup over the whole posting history.
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+
+def write_atomic(path: Path, text: str):
+    """Write to a sibling temp file, fsync, then rename over path"""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _journal_line(event: dict) -> str:
+    return json.dumps(event, separators=(',', ':'), ensure_ascii=False) + "\n"
+
+
+def read_journal(path: Path) -> Tuple[List[dict], bool]:
+    """Every event in an append-only JSON-lines journal, and whether a line was torn"""
+    events, torn = [], False
+    if not path.exists():
+        return events, torn
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                # A torn final line from an interrupted append
+                torn = True
+    return events, torn
+
+
+def append_journal(path: Path, event: dict):
+    """Append one event and fsync before returning"""
+    with open(path, 'a') as f:
+        f.write(_journal_line(event))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def rewrite_journal(path: Path, records: Iterable[dict]):
+    """Atomically replace a journal with one line per record"""
+    write_atomic(path, "".join(_journal_line(record) for record in records))
+
+
+class StateStore:
+    def __init__(self, state_file, journal_file=None):
+        """
+        Args:
+            state_file: Snapshot of the broadcaster state (cursor, totals);
+                None keeps everything in memory, as replays do
+            journal_file: Posting history; defaults to .broadcaster_journal.jsonl
+                next to the state file
+        """
+        self.state_file = Path(state_file) if state_file else None
+        if journal_file is None and self.state_file is not None:
+            journal_file = self.state_file.with_name(".broadcaster_journal.jsonl")
+        self.journal_file = Path(journal_file) if journal_file else None
+
+        # commit hash -> {"commit", "tweet_id", "at"}, in the order first tweeted
+        self.tweeted = OrderedDict()
+        self._lines = 0
+        self.load_journal()
+
+    def __contains__(self, commit_hash):
+        return commit_hash in self.tweeted
+
+    def __len__(self):
+        return len(self.tweeted)
+
+    def load(self) -> Optional[dict]:
+        """The saved snapshot, or None if there isn't one yet"""
+        if self.state_file is None or not self.state_file.exists():
+            return None
+        with open(self.state_file, 'r') as f:
+            return json.load(f)
+
+    def save(self, state: dict):
+        """Replace the snapshot; a crash leaves either the old file or the new one"""
+        if self.state_file is None:
+            return
+        write_atomic(self.state_file, json.dumps(state, indent=2))
+
+    def load_journal(self):
+        """Replay the journal; the last line for a commit wins"""
+        self.tweeted = OrderedDict()
+        self._lines = 0
+        if self.journal_file is None or not self.journal_file.exists():
+            return
+        events, torn = read_journal(self.journal_file)
+        for event in events:
+            self.tweeted.setdefault(event["commit"], {}).update(event)
+        self._lines = len(events)
+        if torn:
+            # Rewrite now, or the next append would be glued onto the torn line
+            self.compact()
+
+    def _append(self, event: dict):
+        self.tweeted.setdefault(event["commit"], {}).update(event)
+        if self.journal_file is None:
+            return
+        append_journal(self.journal_file, event)
+        self._lines += 1
+
+    def record_tweeted(self, commit_hash: str):
+        """A commit was picked and its tweet queued"""
+        if commit_hash not in self.tweeted:
+            self._append({"commit": commit_hash, "tweet_id": None, "at": time.time()})
+
+    def record_posted(self, commit_hash: str, tweet_id: Optional[str]):
+        """The tweet for a commit went out"""
+        self._append({"commit": commit_hash, "tweet_id": tweet_id, "posted_at": time.time()})
+        self.compact_if_needed()
+
+    def tweet_id(self, commit_hash: str) -> Optional[str]:
+        return self.tweeted.get(commit_hash, {}).get("tweet_id")
+
+    def compact_if_needed(self, threshold: int = 64):
+        """Compact once enough superseded lines have piled up"""
+        if self._lines - len(self.tweeted) > threshold:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the journal as one line per commit"""
+        if self.journal_file is None:
+            return
+        rewrite_journal(self.journal_file, self.tweeted.values())
+        self._lines = len(self.tweeted)
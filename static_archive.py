@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Static Archive for Erosion Broadcaster
+A self-hosted, browsable record of every iteration: snippet, diff pair,
+decay level, and the tweet with its ID. Commits are grouped into fixed-size
+shards of JSON and HTML, and a build only rewrites files whose content hash
+changed, so 10k+ iterations stay cheap to regenerate and to serve.
+"""
+
+import hashlib
+import html
+import json
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import blob_stats
+from diff_engine import DiffEngine
+from metrics import METRICS
+from outbox import POSTED
+from state_store import write_atomic
+
+# Bump whenever records or pages change shape; an older archive is rebuilt
+FORMAT_VERSION = 1
+
+TWEET_URL = "https://twitter.com/i/web/status/{}"
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: monospace; max-width: 52em; margin: 2em auto; padding: 0 1em; background: #111; color: #ddd; }}
+a {{ color: #9cf; }}
+article {{ border-top: 1px solid #333; padding: 1em 0; }}
+pre {{ white-space: pre-wrap; background: #1b1b1b; padding: .5em; }}
+.meta {{ color: #888; }}
+td, th {{ padding: .2em .8em; text-align: left; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+def _iteration(value) -> str:
+    return "∞" if value is None else str(value)
+
+
+def content_hash(value) -> str:
+    """Short, stable digest of a string or anything JSON-serializable"""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(value.encode()).hexdigest()[:16]
+
+
+class StaticArchive:
+    # Commits per shard page
+    SHARD_SIZE = 500
+    # Commits analysed per batched git call
+    CHUNK = 512
+    # Points in each shard's corruption sparkline on the index page
+    TREND_POINTS = 24
+
+    def __init__(self, broadcaster, out_dir="archive", shard_size: Optional[int] = None):
+        """
+        Args:
+            broadcaster: ErosionBroadcaster with a synced clone and an up-to-date index
+            out_dir: Where index.html, index.json, manifest.json and shards/ go
+            shard_size: Commits per shard; changing it rebuilds the archive
+        """
+        self.broadcaster = broadcaster
+        self.out_dir = Path(out_dir)
+        self.shard_size = shard_size or self.SHARD_SIZE
+        self.manifest_path = self.out_dir / "manifest.json"
+        # relative path -> content hash, as of the last build and as of this one
+        self._old_pages = {}
+        self._pages = {}
+        self.written = 0
+
+    def _shard(self, seq: int) -> str:
+        return f"{(seq - 1) // self.shard_size:04d}"
+
+    def _load_manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            return {}
+
+    def _usable(self, manifest: dict) -> bool:
+        """True if the last build can be extended rather than redone"""
+        if (manifest.get("version") != FORMAT_VERSION
+                or manifest.get("shard_size") != self.shard_size
+                or manifest.get("seed_salt") != self.broadcaster.seed_salt):
+            return False
+        if not all((self.out_dir / "shards" / f"{shard}.json").exists() for shard in manifest.get("shards", {})):
+            return False
+        cursor = manifest.get("cursor")
+        if not cursor:
+            return True
+        # History rewritten, or the index renumbered under us
+        row = self.broadcaster.index.commit_rows([cursor]).get(cursor)
+        return (row is not None and row["seq"] == manifest.get("seq")
+                and self.broadcaster.git.is_ancestor(cursor, "HEAD"))
+
+    def build(self) -> int:
+        """
+        Bring the archive up to date; returns how many files were rewritten
+
+        New commits are analysed and appended to their shards. Older
+        shards are only touched when their posting records changed (a
+        queued tweet got its ID, a mirror caught up), and any file whose
+        content hash is unchanged is left alone.
+        """
+        (self.out_dir / "shards").mkdir(parents=True, exist_ok=True)
+        old = self._load_manifest()
+        self._old_pages = old.get("pages", {})
+        manifest = {
+            "version": FORMAT_VERSION,
+            "shard_size": self.shard_size,
+            "seed_salt": self.broadcaster.seed_salt,
+            "cursor": None,
+            "seq": 0,
+            "shards": {}
+        }
+        if self._usable(old):
+            manifest.update(cursor=old.get("cursor"), seq=old.get("seq", 0), shards=old.get("shards", {}))
+            self._pages = dict(self._old_pages)
+        elif old:
+            print(f"⚠ Archive in {self.out_dir} is out of date with the history, rebuilding it")
+
+        posts = self._posts_by_shard()
+        added = 0
+
+        # New commits, one shard at a time, so memory stays bounded by a shard
+        current, records = None, []
+        touched = set()
+        existing = set(manifest["shards"])
+        for record in self._iter_new_records(manifest["cursor"]):
+            shard = self._shard(record["seq"])
+            if shard != current:
+                if current is not None:
+                    # The shard being started is its successor
+                    self._write_shard(manifest, current, records, posts.get(current, {}), has_next=True)
+                current, records = shard, []
+                touched.add(shard)
+            records.append(record)
+            manifest["cursor"], manifest["seq"] = record["hash"], record["seq"]
+            added += 1
+        if current is not None:
+            self._write_shard(manifest, current, records, posts.get(current, {}))
+
+        # The shard before the first new one gains its "next" link
+        created = sorted(touched - existing)
+        if created and int(created[0]) > 0:
+            previous = f"{int(created[0]) - 1:04d}"
+            if previous in manifest["shards"] and previous not in touched:
+                self._write_shard(manifest, previous, [], posts.get(previous, {}))
+                touched.add(previous)
+
+        # Older shards whose tweets changed since the last build
+        for shard in sorted(manifest["shards"]):
+            if shard not in touched and manifest["shards"][shard]["posts"] != content_hash(posts.get(shard, {})):
+                self._write_shard(manifest, shard, [], posts.get(shard, {}))
+
+        self._write_indexes(manifest)
+
+        for rel in set(self._old_pages) - set(self._pages):
+            # Shards from a longer, since-rewritten history
+            (self.out_dir / rel).unlink(missing_ok=True)
+        manifest["pages"] = self._pages
+        write_atomic(self.manifest_path, json.dumps(manifest, indent=1, ensure_ascii=False))
+
+        METRICS.incr("archive_commits", added)
+        METRICS.incr("archive_files_written", self.written)
+        print(f"✓ Archived {added} new commit(s) across {len(manifest['shards'])} shard(s), "
+              f"rewrote {self.written} file(s) -> {self.out_dir}")
+        return self.written
+
+    def _posts_by_shard(self) -> Dict[str, dict]:
+        """
+        {shard: {commit hash: post}} from the state journal and the outboxes,
+        where a post is the tweet's ID, text, and any mirror IDs
+        """
+        broadcaster = self.broadcaster
+        outboxes = broadcaster.get_publisher().outboxes
+        posts = {}
+        for commit_hash, entry in broadcaster.store.tweeted.items():
+            queued = outboxes["twitter"].records.get(commit_hash, {})
+            posts[commit_hash] = {
+                "id": entry.get("tweet_id"),
+                "text": queued.get("text"),
+                "posted_at": entry.get("posted_at"),
+                "mirrors": {}
+            }
+        for name, outbox in outboxes.items():
+            if name == "twitter":
+                continue
+            for commit_hash, record in outbox.records.items():
+                if commit_hash in posts and record.get("status") == POSTED:
+                    posts[commit_hash]["mirrors"][name] = record.get("tweet_id")
+
+        by_shard = {}
+        for commit_hash, row in broadcaster.index.commit_rows(posts).items():
+            by_shard.setdefault(self._shard(row["seq"]), {})[commit_hash] = posts[commit_hash]
+        return by_shard
+
+    def _iter_new_records(self, cursor: Optional[str]) -> Iterator[dict]:
+        """Archive records for every commit after cursor, oldest first"""
+        broadcaster = self.broadcaster
+        git = broadcaster.git
+        commits = git.iter_log(f"{cursor}..HEAD" if cursor else None, reverse=True)
+        while True:
+            chunk = list(islice(commits, self.CHUNK))
+            if not chunk:
+                return
+            hashes = [commit["hash"] for commit in chunk]
+            broadcaster.resolve_blobs(hashes)
+            rows = broadcaster.index.commit_rows(hashes)
+            with METRICS.stage("diff"):
+                changes = dict(broadcaster.diffs.iter_commit_changes(hashes))
+            for commit in chunk:
+                row = rows.get(commit["hash"])
+                if row is not None:
+                    yield self._record(commit, row, changes.get(commit["hash"], []))
+
+    def _record(self, commit: dict, row: dict, changes: list) -> dict:
+        """Everything the archive shows for one commit, except the tweet"""
+        broadcaster = self.broadcaster
+        commit_hash = commit["hash"]
+        # Seeded like the tweet, so the archived snippet is the one that was tweeted
+        snippet = broadcaster.get_corrupted_snippet(commit_hash)
+        top = DiffEngine.most_eroded(changes, k=1)
+        stats = broadcaster.get_blob_stats(commit_hash)
+        return {
+            "seq": row["seq"],
+            "hash": commit_hash,
+            "date": commit["date"],
+            "message": commit["message"],
+            "iteration": row["iteration"],
+            "decay_level": row["decay_level"],
+            "restoration": bool(row["restoration"]),
+            "corrupted_lines": row["corrupted_lines"],
+            "corruption_score": row["corruption_score"],
+            "entropy": stats.entropy if stats else None,
+            "snippet": snippet,
+            "diff": [top[0].removed[:200], top[0].added[:200]] if top else None,
+            "tweet": None
+        }
+
+    def _apply_posts(self, records: List[dict], posts: dict):
+        """Attach posting records; text the outbox no longer has is kept, or re-rendered"""
+        for record in records:
+            post = posts.get(record["hash"])
+            if post is None:
+                record["tweet"] = None
+                continue
+            text = post["text"] or (record.get("tweet") or {}).get("text")
+            if text is None:
+                # Compacted out of the outbox before it was archived; rendering is deterministic
+                text = self.broadcaster.generate_tweet(
+                    {"hash": record["hash"], "message": record["message"], "date": record["date"]})
+            record["tweet"] = dict(post, text=text)
+
+    def _write(self, rel: str, text: str):
+        """Atomically replace a file unless its content hash is unchanged"""
+        digest = content_hash(text)
+        self._pages[rel] = digest
+        path = self.out_dir / rel
+        if self._old_pages.get(rel) == digest and path.exists():
+            return
+        write_atomic(path, text)
+        self.written += 1
+
+    def _write_shard(self, manifest: dict, shard: str, new_records: List[dict], posts: dict,
+                     has_next: Optional[bool] = None):
+        """
+        Merge new records into a shard, attach its posts, and write its JSON and HTML
+
+        has_next says whether the page links to the following shard; by
+        default, whether the manifest already lists it.
+        """
+        path = self.out_dir / "shards" / f"{shard}.json"
+        records = []
+        if shard in manifest["shards"] and path.exists():
+            with open(path, 'r') as f:
+                records = json.load(f)["commits"]
+            if new_records:
+                records = [r for r in records if r["seq"] < new_records[0]["seq"]]
+        records += new_records
+        self._apply_posts(records, posts)
+
+        self._write(f"shards/{shard}.json", json.dumps(
+            {"shard": shard, "commits": records}, ensure_ascii=False, separators=(',', ':')))
+        if has_next is None:
+            has_next = f"{int(shard) + 1:04d}" in manifest["shards"]
+        self._write(f"shards/{shard}.html", self._render_shard(shard, records, has_next))
+
+        scores = [r["corruption_score"] or 0 for r in records]
+        step = max(1, -(-len(scores) // self.TREND_POINTS))
+        manifest["shards"][shard] = {
+            "count": len(records),
+            "tweeted": sum(1 for r in records if r["tweet"]),
+            "first_iteration": records[0]["iteration"],
+            "last_iteration": records[-1]["iteration"],
+            "first_date": records[0]["date"],
+            "last_date": records[-1]["date"],
+            "trend": blob_stats.sparkline(scores[::step]),
+            "posts": content_hash(posts)
+        }
+
+    def _render_shard(self, shard: str, records: List[dict], has_next: bool) -> str:
+        number = int(shard)
+        nav = ['<a href="../index.html">index</a>']
+        if number > 0:
+            nav.insert(0, f'<a href="{number - 1:04d}.html">&larr; previous</a>')
+        if has_next:
+            nav.append(f'<a href="{number + 1:04d}.html">next &rarr;</a>')
+        body = f"<p>{' · '.join(nav)}</p>\n" + "\n".join(self._render_commit(r) for r in records)
+        title = (f"Digital Erosion, iterations {_iteration(records[0]['iteration'])}"
+                 f"–{_iteration(records[-1]['iteration'])}")
+        return PAGE.format(title=html.escape(title), body=body)
+
+    @staticmethod
+    def _render_commit(record: dict) -> str:
+        esc = html.escape
+        commit_hash = record["hash"]
+        heading = f"iteration {_iteration(record['iteration'])}"
+        heading += f" · {esc(record['decay_level'] or 'unknown')} erosion"
+        if record["restoration"]:
+            heading += " · ☽ RESTORATION ☾"
+        meta = f"{esc(record['date'])} · <code>{commit_hash[:7]}</code> · " \
+               f"{record['corrupted_lines']} corrupted lines · score {record['corruption_score']}"
+        if record["entropy"] is not None:
+            meta += f" · {record['entropy']:.2f} bits/byte"
+
+        parts = [f'<article id="{commit_hash}">',
+                 f'<h2><a href="#{commit_hash}">{heading}</a></h2>',
+                 f'<p class="meta">{meta}</p>',
+                 f"<p>{esc(record['message'])}</p>"]
+        if record["snippet"]:
+            parts.append(f"<pre>{esc(record['snippet'])}</pre>")
+        if record["diff"]:
+            parts.append(f"<pre>was:\n{esc(record['diff'][0])}\n\nnow:\n{esc(record['diff'][1])}</pre>")
+        tweet = record["tweet"]
+        if tweet:
+            parts.append(f"<blockquote><pre>{esc(tweet['text'])}</pre></blockquote>")
+            links = [f'<a href="{TWEET_URL.format(esc(tweet["id"]))}">tweet {esc(tweet["id"])}</a>'
+                     if tweet["id"] else "tweet queued"]
+            links += [f"{esc(name)} {esc(str(post_id))}" for name, post_id in sorted(tweet["mirrors"].items())]
+            parts.append(f"<p class=\"meta\">{' · '.join(links)}</p>")
+        parts.append("</article>")
+        return "\n".join(parts)
+
+    def _write_indexes(self, manifest: dict):
+        """index.json and index.html: one entry per shard"""
+        shards = [dict({k: v for k, v in entry.items() if k != "posts"}, name=name,
+                       json=f"shards/{name}.json", html=f"shards/{name}.html")
+                  for name, entry in sorted(manifest["shards"].items())]
+        summary = {
+            "commits": sum(s["count"] for s in shards),
+            "tweeted": sum(s["tweeted"] for s in shards),
+            "latest": manifest["cursor"],
+            "shard_size": self.shard_size,
+            "shards": shards
+        }
+        self._write("index.json", json.dumps(summary, indent=1, ensure_ascii=False))
+
+        esc = html.escape
+        rows = "\n".join(
+            f'<tr><td><a href="{s["html"]}">{_iteration(s["first_iteration"])}–{_iteration(s["last_iteration"])}</a></td>'
+            f'<td>{esc(s["first_date"][:10])} – {esc(s["last_date"][:10])}</td>'
+            f'<td>{s["count"]}</td><td>{s["tweeted"]}</td><td>{s["trend"]}</td></tr>'
+            for s in reversed(shards))
+        body = (f"<p>{summary['commits']} iterations, {summary['tweeted']} tweeted. "
+                f'Also as <a href="index.json">JSON</a>.</p>\n'
+                "<table>\n<tr><th>Iterations</th><th>Dates</th><th>Commits</th><th>Tweets</th><th>Corruption</th></tr>\n"
+                f"{rows}\n</table>")
+        self._write("index.html", PAGE.format(title="Digital Erosion Archive", body=body))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the async thread poster
+Threads run against the fake Twitter backend on a FakeClock: a thread that
+fails part-way resumes from ThreadState without reposting, and rate limits
+are waited out until their reset time before a thread gives up. Run with
+`python -m unittest`.
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from async_poster import AsyncThreadPoster
+from fake_twitter import AsyncFakeTwitterBackend, FakeClock, FakeTwitterBackend
+from twitter_integration import RateLimitError
+
+TWEETS = [f"decay thread part {i}" for i in range(5)]
+
+
+class DroppingBackend(AsyncFakeTwitterBackend):
+    def __init__(self, fail_at: int, **kwargs):
+        """Loses the connection on tweet number fail_at (counting from 1)"""
+        super().__init__(**kwargs)
+        self.fail_at = fail_at
+
+    async def create_tweet(self, text, in_reply_to_tweet_id=None):
+        if len(self.fake.tweets) + 1 == self.fail_at:
+            raise ConnectionResetError("connection reset by peer")
+        return await super().create_tweet(text, in_reply_to_tweet_id)
+
+
+class AsyncThreadPosterTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.state_file = Path(self.dir.name) / "threads.json"
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    async def sleep(self, seconds):
+        self.clock.sleep(seconds)
+        await asyncio.sleep(0)
+
+    def run_thread(self, backend, **kwargs):
+        poster = AsyncThreadPoster({"erosion": backend}, state_file=self.state_file,
+                                   now=self.clock.time, sleep=self.sleep, **kwargs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = poster.run([{"account": "erosion", "tweets": TWEETS, "key": "t"}])
+        return results["t"]
+
+    def assert_chain(self, fake, ids):
+        self.assertEqual([fake.tweets[i]["text"] for i in ids], TWEETS)
+        self.assertEqual([fake.tweets[i]["in_reply_to"] for i in ids], [None] + ids[:-1])
+
+    def test_resumes_a_partial_thread(self):
+        fake = FakeTwitterBackend(clock=self.clock)
+        result = self.run_thread(DroppingBackend(3, fake=fake))
+        self.assertIsInstance(result, ConnectionResetError)
+        saved = json.loads(self.state_file.read_text())["t"]
+        self.assertEqual(len(saved["ids"]), 2)
+        self.assertFalse(saved["complete"])
+
+        ids = self.run_thread(AsyncFakeTwitterBackend(fake=fake))
+        self.assertEqual(ids[:2], saved["ids"])
+        self.assertEqual(len(fake.tweets), len(TWEETS))
+        self.assert_chain(fake, ids)
+        self.assertTrue(json.loads(self.state_file.read_text())["t"]["complete"])
+
+    def test_waits_out_a_rate_limit(self):
+        fake = FakeTwitterBackend(clock=self.clock, rate_limit=2, window=600)
+        started = self.clock.time()
+
+        ids = self.run_thread(AsyncFakeTwitterBackend(fake=fake))
+        self.assert_chain(fake, ids)
+        # Two windows had to reset, and each wait ran to the reset time
+        self.assertEqual(fake.rate_limited, 2)
+        self.assertGreaterEqual(self.clock.time() - started, 2 * 600)
+
+    def test_gives_up_when_the_reset_is_too_far(self):
+        fake = FakeTwitterBackend(clock=self.clock, rate_limit=2, window=3600)
+
+        result = self.run_thread(AsyncFakeTwitterBackend(fake=fake), max_wait=900)
+        self.assertIsInstance(result, RateLimitError)
+        self.assertEqual(len(json.loads(self.state_file.read_text())["t"]["ids"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the Corruption Index
+Functions are tracked by position, so a def whose name erosion mangles
+keeps its history. Run with `python -m unittest`.
+"""
+
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from corruption_index import MODULE_LEVEL, CorruptionIndex
+from corruption_scanner import CorruptionScanner
+from git_reader import GitObjectReader
+
+CLEAN = "import os\n\ndef save_state(x):\n    a = 1\n    b = 2\n\ndef load_state(x):\n    c = 3\n"
+
+
+class MatchFunctionsTest(unittest.TestCase):
+    def test_mangled_name_keeps_its_position(self):
+        past = [MODULE_LEVEL, "save_state", "load_state"]
+        self.assertEqual(CorruptionIndex.match_functions(past, [MODULE_LEVEL, "sa", "load_state"]),
+                         {0: 0, 1: 1, 2: 2})
+
+    def test_vanished_def_does_not_shift_the_rest(self):
+        past = [MODULE_LEVEL, "a", "b", "c"]
+        self.assertEqual(CorruptionIndex.match_functions(past, [MODULE_LEVEL, "a", "c"]), {0: 0, 1: 1, 2: 3})
+
+
+class FastestDecayTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.repo = Path(self.dir.name) / "repo"
+        self.git("init", "-q", str(self.repo), cwd=self.dir.name)
+        for i, text in enumerate([
+            CLEAN,
+            CLEAN.replace("a = 1", "a#a = 1"),
+            # The corruption also takes a bite out of save_state's name
+            CLEAN.replace("save_state", "sa#e_state").replace("a = 1", "a#a = 1").replace("b = 2", "b*b = 2"),
+        ]):
+            (self.repo / "erosion.py").write_text(text)
+            self.git("add", "erosion.py")
+            self.git("commit", "-qm", f"iteration {i}: slight erosion ({i} mutations)")
+        self.index = CorruptionIndex(Path(self.dir.name) / "index.sqlite")
+        self.reader = GitObjectReader(self.repo)
+        self.index.update(self.reader, CorruptionScanner())
+
+    def tearDown(self):
+        self.reader.close()
+        self.index.close()
+        self.dir.cleanup()
+
+    def git(self, *args, cwd=None):
+        subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+                       cwd=cwd or self.repo, check=True, capture_output=True)
+
+    def test_gain_survives_a_mangled_name(self):
+        fastest = self.index.fastest_decaying_functions(window=1)
+        self.assertEqual([(f["function"], f["gained"]) for f in fastest], [("save_state", 2)])
+        self.assertEqual(fastest[0]["span"], 1)
+
+    def test_span_is_what_is_indexed(self):
+        # Only two commits precede the last one, whatever the window asks for
+        fastest = self.index.fastest_decaying_functions(window=50)
+        self.assertEqual([(f["function"], f["span"]) for f in fastest], [("save_state", 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the Corruption Scanner
+Fuzzes CorruptionScanner against the original line-by-line heuristics from
+get_corrupted_snippet, which it has to match exactly: same lines, same line
+numbers, same context lines. Run with `python -m unittest`.
+"""
+
+import random
+import re
+import unittest
+
+from corruption_scanner import CorruptionScanner
+
+# Line fragments that exercise every branch of the heuristics
+FRAGMENTS = [
+    "def save_state(self):", "    return x", "a*b", "a#b", "x # 2024", "# 1999", "#1999",
+    "  .attr", ".", "el*e:", "with#", "def fo#", "chars i]", "~", "`", "\t", "*", "#", "]",
+    "A*B", "\u00e9*\u00e8", "   ", "", "pass", "a *b", "x~y", "  # note", "\u2028", "\r",
+]
+CASES = 3000
+
+
+def legacy_candidates(text):
+    """The heuristics as get_corrupted_snippet applied them before the scanner"""
+    lines = text.split('\n')
+    corrupted_lines = []
+    for i, line in enumerate(lines):
+        if any(char in line for char in ['#', '*', '~', '`', '\t']) and len(line.strip()) > 0:
+            if re.search(r'[a-z]\*[a-z]|[a-z]#[a-z]|^\s*\.|^\s*#\s*\d{4}', line):
+                corrupted_lines.append((i, line, lines[i - 1] if i > 0 else ""))
+        elif re.search(r'el\*e:|with#|def\s+\w+#|chars\s+i\]', line):
+            corrupted_lines.append((i, line, lines[i - 1] if i > 0 else ""))
+    non_empty = [(i, line) for i, line in enumerate(lines) if line.strip()]
+    return corrupted_lines, non_empty
+
+
+def random_blob(rng):
+    lines = []
+    for _ in range(rng.randint(0, 30)):
+        parts = [rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 3))]
+        lines.append(rng.choice(["", " ", "    ", "\t"]) + rng.choice(["", " "]).join(parts))
+    return "\n".join(lines) + rng.choice(["", "\n", "\n\n"])
+
+
+class CorruptionScannerTest(unittest.TestCase):
+    def setUp(self):
+        self.scanner = CorruptionScanner()
+
+    def assert_matches_legacy(self, text):
+        expected, expected_nonblank = legacy_candidates(text)
+        spans = self.scanner.scan(text)
+        got = [(s.line_no, self.scanner.line(text, s), self.scanner.previous_line(text, s)) for s in spans]
+        self.assertEqual(got, expected, repr(text))
+        nonblank = [(s.line_no, self.scanner.line(text, s)) for s in self.scanner.iter_nonblank(text)]
+        self.assertEqual(nonblank, expected_nonblank, repr(text))
+        for span in spans:
+            self.assertTrue(self.scanner.is_corrupted(self.scanner.line(text, span)))
+            self.assertEqual(span.score, self.scanner.score(self.scanner.line(text, span)))
+
+    def test_edge_cases(self):
+        for text in ["", "\n", ".", " .x\n", "a*b", "\na*b\n", "x\n  .y", "# 2024\n#2024",
+                     "el*e:\nwith#\ndef f#:\nchars i]", "\t\n\t*", "a]b\n.", "\u2028a#b"]:
+            self.assert_matches_legacy(text)
+
+    def test_fuzz_against_legacy_heuristics(self):
+        rng = random.Random(4)
+        for _ in range(CASES):
+            self.assert_matches_legacy(random_blob(rng))
+
+    def test_real_erosion_shapes(self):
+        rng = random.Random(7)
+        base = "\n".join(["def compute(x):", "    return x * 42  # step", "", "class A:",
+                          "    def m(self):", "        pass"] * 20)
+        for _ in range(200):
+            chars = list(base)
+            for _ in range(rng.randint(0, 40)):
+                chars[rng.randrange(len(chars))] = rng.choice("#*~`.\t]")
+            self.assert_matches_legacy("".join(chars))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for the append-only journals
+A crash mid-append leaves a torn last line; reopening must repair it so the
+next append starts on a fresh line. Run with `python -m unittest`.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from outbox import Outbox
+from state_store import StateStore, read_journal
+
+
+class TornJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def tear(self, path):
+        with open(path, 'a') as f:
+            f.write('{"commit": "a", "sta')
+
+    def test_outbox_repairs_torn_line(self):
+        path = self.root / "outbox.jsonl"
+        outbox = Outbox(path)
+        outbox.enqueue("a", "héllo")
+        outbox.enqueue("b", "x")
+        self.tear(path)
+
+        Outbox(path).mark_posted("a", "1")
+        events, torn = read_journal(path)
+        self.assertFalse(torn)
+        self.assertEqual([r["commit"] for r in Outbox(path).pending()], ["b"])
+
+    def test_state_store_repairs_torn_line(self):
+        StateStore(self.root / "state.json").record_tweeted("a")
+        journal = self.root / ".broadcaster_journal.jsonl"
+        self.tear(journal)
+
+        StateStore(self.root / "state.json").record_posted("a", "9")
+        events, torn = read_journal(journal)
+        self.assertFalse(torn)
+        self.assertEqual(StateStore(self.root / "state.json").tweet_id("a"), "9")
+
+
+if __name__ == "__main__":
+    unittest.main()
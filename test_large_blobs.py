@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for oversized erosion.py blobs
+Commits a generated multi-hundred-megabyte erosion.py (invalid UTF-8, a
+huge line with no newline) and checks that snippets, the corruption index
+and the byte statistics stay within a memory bound. Each measurement runs
+in a fresh interpreter so peak RSS is its own.
+
+Slow and disk-hungry, so opt-in:
+    EROSION_LARGE_BLOB_TESTS=1 python -m unittest test_large_blobs
+EROSION_LARGE_BLOB_MB sets the blob size (default 300).
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ENABLED = os.environ.get("EROSION_LARGE_BLOB_TESTS") == "1"
+BLOB_MB = int(os.environ.get("EROSION_LARGE_BLOB_MB", 300))
+# One line that never ends, like a runaway mutation loop would write
+LONG_LINE_MB = 50
+
+# Runs in the child: build a broadcaster on the repo and measure one stage
+CHILD = r"""
+import json, os, resource, sys
+sys.path.insert(0, sys.argv[1])
+from broadcast import ErosionBroadcaster
+from metrics import METRICS
+
+repo, state_dir, what = sys.argv[2:5]
+os.makedirs(f"{state_dir}/{what}")
+b = ErosionBroadcaster(connect_twitter=False, local_erosion_path=repo,
+                       state_file=f"{state_dir}/{what}/state.json", mirrors=[])
+h = next(b.git.iter_log(max_count=1))["hash"]
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if what == "snippet":
+    out = b.get_corrupted_snippet(h)
+elif what == "index":
+    b.index.update(b.git, b.scanner)
+    out = b.index.commit_stats(h)["corrupted_lines"]
+else:
+    out = b.get_blob_stats(h)._asdict()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# The git pipe must still be usable after the big read
+ok = b.git.resolve(h) == h
+print(json.dumps({"peak_mib": (peak - base) / 1024, "out": out, "ok": ok,
+                  "counters": METRICS.snapshot()["counters"]}))
+"""
+
+
+def write_blob(path: Path):
+    """Ordinary code with a corrupted line every 50 blocks and invalid UTF-8 sprinkled in"""
+    block = b"".join(b"    value_%d = compute(x, %d)  # step\n" % (i, i) for i in range(20))
+    corrupted = b"    res#lt = a*b.strip()\n"
+    invalid = b"    name = '\xff\xfe\xc3('  # a#b\n"
+    target = (BLOB_MB - LONG_LINE_MB) * 1024 * 1024
+    written = 0
+    with open(path, 'wb') as f:
+        f.write(b"def erode(x):\n")
+        i = 0
+        while written < target:
+            chunk = block
+            if i % 50 == 0:
+                chunk += corrupted
+            if i % 1000 == 0:
+                chunk += invalid
+            f.write(chunk)
+            written += len(chunk)
+            i += 1
+        f.write(b"x" * (LONG_LINE_MB * 1024 * 1024))
+
+
+@unittest.skipUnless(ENABLED, "set EROSION_LARGE_BLOB_TESTS=1 to run the large-blob tests")
+class LargeBlobTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.root = Path(cls.dir.name)
+        cls.repo = cls.root / "repo"
+        git = ["git", "-c", "user.name=t", "-c", "user.email=t@t"]
+        subprocess.run(git + ["init", "-q", str(cls.repo)], check=True)
+        write_blob(cls.repo / "erosion.py")
+        subprocess.run(git + ["add", "erosion.py"], cwd=cls.repo, check=True)
+        subprocess.run(git + ["commit", "-qm", "iteration 1: critical erosion (1 mutations)"],
+                       cwd=cls.repo, check=True)
+        # The working copy isn't needed; only the blob in the object store
+        (cls.repo / "erosion.py").unlink()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.dir.cleanup()
+
+    def measure(self, what: str) -> dict:
+        result = subprocess.run(
+            [sys.executable, "-c", CHILD, str(Path(__file__).resolve().parent), str(self.repo),
+             str(self.root), what],
+            capture_output=True, text=True, timeout=1800)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertTrue(report["ok"])
+        return report
+
+    def test_snippet_is_streamed_in_constant_memory(self):
+        report = self.measure("snippet")
+        self.assertEqual(report["counters"].get("snippets_streamed"), 1)
+        self.assertIn("#", report["out"])
+        self.assertLess(report["peak_mib"], 64)
+
+    def test_index_scans_within_the_byte_cap(self):
+        report = self.measure("index")
+        self.assertGreater(report["out"], 0)
+        self.assertLess(report["peak_mib"], 256)
+
+    def test_stats_stay_bounded(self):
+        report = self.measure("stats")
+        self.assertGreater(report["out"]["marked_lines"], 0)
+        self.assertLess(report["peak_mib"], 384)
+
+
+if __name__ == "__main__":
+    unittest.main()
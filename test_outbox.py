@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for the outbox scheduler
+Drains outboxes through the fake Twitter backend on a FakeClock: rate limits
+are waited out to their reset time, transient errors back off exponentially
+until the scheduler gives up, duplicates count as posted, forbidden tweets
+are dropped, and a stop event cuts a wait short. Run with `python -m unittest`.
+"""
+
+import contextlib
+import io
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from fake_twitter import FakeClock, FakeTwitterBackend
+from outbox import FAILED, PENDING, POSTED, Outbox, OutboxScheduler
+from twitter_integration import ForbiddenError, TwitterPoster
+
+COMMITS = [f"{i:040x}" for i in range(3)]
+
+
+class ScriptedBackend(FakeTwitterBackend):
+    def __init__(self, errors: dict, **kwargs):
+        """Raises errors[text], in order, before accepting that text"""
+        super().__init__(**kwargs)
+        self.errors = errors
+
+    def create_tweet(self, text, in_reply_to_tweet_id=None):
+        if self.errors.get(text):
+            raise self.errors[text].pop(0)
+        return super().create_tweet(text, in_reply_to_tweet_id)
+
+
+class TopOfRange:
+    """Jitter that always picks the upper bound, so waits are exact"""
+    def uniform(self, low, high):
+        return high
+
+
+class OutboxSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.outbox = Outbox(Path(self.dir.name) / "outbox.jsonl")
+        for i, commit_hash in enumerate(COMMITS):
+            self.outbox.enqueue(commit_hash, f"iteration {i}: synthetic decay")
+        self.clock = FakeClock()
+        self.sleeps = []
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.clock.sleep(seconds)
+
+    def drain(self, backend, **kwargs) -> OutboxScheduler:
+        with contextlib.redirect_stdout(io.StringIO()):
+            poster = TwitterPoster(backend=backend)
+            scheduler = OutboxScheduler(self.outbox, poster, now=self.clock.time, sleep=self.sleep,
+                                        rng=TopOfRange(), **kwargs)
+            scheduler.run()
+        return scheduler
+
+    def record(self, i: int) -> dict:
+        return self.outbox.records[COMMITS[i]]
+
+    def test_rate_limit_waits_until_reset(self):
+        backend = FakeTwitterBackend(clock=self.clock, rate_limit=2, window=600)
+        started = self.clock.time()
+
+        scheduler = self.drain(backend)
+        self.assertEqual(scheduler.posted, 3)
+        self.assertEqual(scheduler.rate_limit_waits, 1)
+        # The wait ran to the reset time (plus the jitter second), and didn't count as an attempt
+        self.assertEqual(self.sleeps, [601])
+        self.assertGreaterEqual(backend.tweets[self.record(2)["tweet_id"]]["posted_at"], started + 600)
+        self.assertEqual(self.record(2)["attempts"], 0)
+
+    def test_transient_errors_back_off_exponentially(self):
+        backend = ScriptedBackend({"iteration 0: synthetic decay": [ConnectionError("reset")] * 3},
+                                  clock=self.clock)
+
+        scheduler = self.drain(backend, base_delay=2.0)
+        self.assertEqual(scheduler.posted, 3)
+        self.assertEqual(self.sleeps, [4.0, 8.0, 16.0])
+        self.assertEqual(self.record(0)["attempts"], 3)
+        self.assertEqual(self.record(0)["status"], POSTED)
+
+    def test_gives_up_after_max_attempts(self):
+        backend = ScriptedBackend({"iteration 0: synthetic decay": [ConnectionError("reset")] * 20},
+                                  clock=self.clock)
+
+        scheduler = self.drain(backend)
+        self.assertEqual(self.record(0)["status"], FAILED)
+        self.assertEqual(self.record(0)["attempts"], 8)
+        self.assertEqual(len(self.sleeps), 7)
+        # Giving up on one tweet doesn't hold back the rest
+        self.assertEqual(scheduler.posted, 2)
+
+    def test_duplicate_counts_as_posted(self):
+        backend = FakeTwitterBackend(clock=self.clock)
+        # Posted by a run that died before recording it
+        backend.create_tweet("iteration 1: synthetic decay")
+        announced = []
+
+        scheduler = self.drain(backend, on_posted=lambda commit_hash, tweet_id: announced.append(commit_hash))
+        self.assertEqual(self.record(1)["status"], POSTED)
+        self.assertIsNone(self.record(1)["tweet_id"])
+        self.assertEqual(announced, COMMITS)
+        self.assertEqual(scheduler.posted, 2)
+        self.assertEqual(self.sleeps, [])
+
+    def test_forbidden_is_marked_failed(self):
+        backend = ScriptedBackend({"iteration 1: synthetic decay": [ForbiddenError("suspended")]},
+                                  clock=self.clock)
+
+        scheduler = self.drain(backend)
+        self.assertEqual(self.record(1)["status"], FAILED)
+        self.assertEqual(self.record(1)["last_error"], "suspended")
+        self.assertEqual(scheduler.retries, 0)
+        self.assertEqual(scheduler.posted, 2)
+
+    def test_stop_event_cuts_a_wait_short(self):
+        backend = FakeTwitterBackend(clock=self.clock, rate_limit=2, window=600)
+        stop = threading.Event()
+        threading.Timer(0.1, stop.set).start()
+
+        started = time.monotonic()
+        scheduler = self.drain(backend, stop=stop)
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual(scheduler.posted, 2)
+        self.assertEqual(scheduler.waited, 0)
+        self.assertEqual(self.record(2)["status"], PENDING)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-destination publisher
+Drives Publisher against the local fake Mastodon and Bluesky servers: every
+destination gets every post, one destination's latency, failures or retries
+never hold up the others, and Mastodon's Idempotency-Key stops a retried
+post from appearing twice. Run with `python -m unittest`.
+"""
+
+import contextlib
+import io
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from fake_servers import FakeBlueskyServer, FakeMastodonServer
+from fake_twitter import FakeClock
+from outbox import FAILED, POSTED, Outbox
+from publishers import ArchivePoster, BlueskyPoster, Destination, MastodonPoster, Publisher
+
+COMMITS = [f"{i:040x}" for i in range(3)]
+
+
+class FlakyMastodonServer(FakeMastodonServer):
+    def __init__(self, failures: int = 0, lose_responses: int = 0, **kwargs):
+        """
+        Args:
+            failures: Posts answered with a 503 before anything is created
+            lose_responses: Posts that are created, but whose reply is a 503
+        """
+        super().__init__(**kwargs)
+        self.failures = failures
+        self.lose_responses = lose_responses
+        self.post_requests = 0
+
+    def respond(self, method, path, headers, body):
+        if method == "POST" and path == "/api/v1/statuses":
+            self.post_requests += 1
+            if self.failures:
+                self.failures -= 1
+                return 503, {"error": "Service unavailable"}
+            reply = super().respond(method, path, headers, body)
+            if self.lose_responses:
+                self.lose_responses -= 1
+                return 503, {"error": "Gateway timeout"}
+            return reply
+        return super().respond(method, path, headers, body)
+
+
+class BrokenPoster:
+    """A poster that blows up before the scheduler even starts"""
+    @property
+    def connected(self):
+        raise OSError("socket exploded")
+
+
+class PublisherTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.dir.name)
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+        self.dir.cleanup()
+
+    def start(self, server):
+        self.servers.append(server.start())
+        return server
+
+    def mastodon(self, server) -> Destination:
+        return Destination("mastodon", MastodonPoster(server.url, server.token), 500, None)
+
+    def bluesky(self, server) -> Destination:
+        return Destination("bluesky", BlueskyPoster(server.url, server.handle, server.password), 300, None)
+
+    def publisher(self, destinations, clock=None) -> Publisher:
+        outboxes = {d.name: Outbox(self.root / f"{d.name}.jsonl") for d in destinations}
+        publisher = Publisher(destinations, outboxes, clock=clock)
+        for i, commit_hash in enumerate(COMMITS):
+            publisher.enqueue(commit_hash, f"iteration {i}: synthetic decay")
+        return publisher
+
+    def flush(self, publisher, **kwargs) -> dict:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return publisher.flush(**kwargs)
+
+    def test_every_destination_gets_every_post(self):
+        mastodon = self.start(FakeMastodonServer())
+        bluesky = self.start(FakeBlueskyServer())
+        archive = self.root / "posts.jsonl"
+        publisher = self.publisher([self.mastodon(mastodon), self.bluesky(bluesky),
+                                    Destination("archive", ArchivePoster(archive), None, None)])
+
+        self.assertEqual(self.flush(publisher), {"mastodon": 3, "bluesky": 3, "archive": 3})
+        texts = [f"iteration {i}: synthetic decay" for i in range(3)]
+        self.assertEqual(mastodon.posts, texts)
+        self.assertEqual(bluesky.posts, texts)
+        self.assertEqual([json.loads(line)["text"] for line in archive.read_text().splitlines()], texts)
+        self.assertEqual(publisher.pending(), 0)
+
+    def test_slow_destination_does_not_hold_up_the_others(self):
+        mastodon = self.start(FakeMastodonServer(latency=0.3))
+        bluesky = self.start(FakeBlueskyServer())
+        publisher = self.publisher([self.mastodon(mastodon), self.bluesky(bluesky)])
+        posted_at = {"mastodon": [], "bluesky": []}
+
+        self.flush(publisher, on_posted={
+            name: (lambda commit_hash, post_id, times=times: times.append(time.monotonic()))
+            for name, times in posted_at.items()})
+        self.assertEqual(len(posted_at["mastodon"]), 3)
+        self.assertEqual(len(posted_at["bluesky"]), 3)
+        # Bluesky is done before Mastodon has answered even once
+        self.assertLess(max(posted_at["bluesky"]), min(posted_at["mastodon"]))
+
+    def test_failing_destination_does_not_stop_the_others(self):
+        bluesky = self.start(FakeBlueskyServer())
+        publisher = self.publisher([Destination("broken", BrokenPoster(), None, None),
+                                    self.bluesky(bluesky)])
+
+        self.assertEqual(self.flush(publisher), {"broken": 0, "bluesky": 3})
+        self.assertEqual(len(publisher.outboxes["broken"].pending()), 3)
+
+        # Alone, it is flushed inline, and must be caught the same way
+        self.assertEqual(self.flush(publisher), {"broken": 0})
+
+    def test_retries_are_counted_per_destination(self):
+        mastodon = self.start(FlakyMastodonServer(failures=100))
+        bluesky = self.start(FakeBlueskyServer())
+        publisher = self.publisher([self.mastodon(mastodon), self.bluesky(bluesky)], clock=FakeClock())
+
+        self.assertEqual(self.flush(publisher), {"mastodon": 0, "bluesky": 3})
+        for record in publisher.outboxes["mastodon"].records.values():
+            self.assertEqual(record["status"], FAILED)
+            self.assertEqual(record["attempts"], 8)
+        self.assertEqual(mastodon.post_requests, 3 * 8)
+        for record in publisher.outboxes["bluesky"].records.values():
+            self.assertEqual(record["status"], POSTED)
+            self.assertEqual(record["attempts"], 0)
+
+    def test_transient_failures_are_retried(self):
+        mastodon = self.start(FlakyMastodonServer(failures=2))
+        publisher = self.publisher([self.mastodon(mastodon)], clock=FakeClock())
+
+        self.assertEqual(self.flush(publisher), {"mastodon": 3})
+        self.assertEqual(len(mastodon.posts), 3)
+        self.assertEqual(publisher.outboxes["mastodon"].records[COMMITS[0]]["attempts"], 2)
+
+    def test_idempotency_key_dedupes_a_retried_post(self):
+        # The first status is created but its reply is lost, so the scheduler retries it
+        mastodon = self.start(FlakyMastodonServer(lose_responses=1))
+        publisher = self.publisher([self.mastodon(mastodon)], clock=FakeClock())
+
+        self.assertEqual(self.flush(publisher), {"mastodon": 3})
+        self.assertEqual(mastodon.post_requests, 4)
+        self.assertEqual(len(mastodon.posts), 3)
+        record = publisher.outboxes["mastodon"].records[COMMITS[0]]
+        self.assertEqual(record["attempts"], 1)
+        self.assertEqual(record["tweet_id"], "100000")
+
+        # Keyed on the commit, so a re-rendered text for it isn't posted again either
+        poster = MastodonPoster(mastodon.url, mastodon.token)
+        self.assertEqual(poster.send("iteration 0: rendered anew", key=COMMITS[0]), "100000")
+        self.assertEqual(len(mastodon.posts), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
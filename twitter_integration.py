@@ -5,16 +5,123 @@ Handles actual posting to Twitter/X API
 """
 
 import os
-import tweepy
 from typing import Optional
 from pathlib import Path
 
+from metrics import METRICS
+
+
+def load_local_env():
+    """Load environment variables from .env.local file if it exists"""
+    env_file = Path(__file__).parent / '.env.local'
+    if env_file.exists():
+        with open(env_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    # Only set if not already in environment (GitHub secrets take precedence)
+                    if key not in os.environ:
+                        os.environ[key] = value
+
+
+class RateLimitError(Exception):
+    """The API refused a request; retrying before reset_at (epoch seconds) is pointless"""
+    def __init__(self, message="Rate limit exceeded", reset_at: Optional[float] = None):
+        super().__init__(message)
+        self.reset_at = reset_at
+
+
+class ForbiddenError(Exception):
+    """The API rejected a tweet outright (suspension, policy, ...)"""
+
+
+class DuplicateTweetError(ForbiddenError):
+    """The API rejected a tweet because the same text was posted recently"""
+
+
+class TwitterBackend:
+    """
+    Where tweets actually go
+
+    Backends raise RateLimitError / DuplicateTweetError / ForbiddenError so
+    callers never depend on a particular client library.
+    """
+    def create_tweet(self, text: str, in_reply_to_tweet_id: Optional[str] = None) -> Optional[str]:
+        """Post a tweet and return its ID"""
+        raise NotImplementedError
+
+    def get_username(self) -> Optional[str]:
+        """Handle of the authenticated account, or None if credentials don't work"""
+        raise NotImplementedError
+
+
+class TweepyBackend(TwitterBackend):
+    def __init__(self, api_key, api_secret, access_token, access_secret):
+        """Twitter API v2 through tweepy"""
+        # Imported here so dry runs and replays never pay for tweepy's import
+        import tweepy
+        self.errors = tweepy.errors
+        self.client = tweepy.Client(
+            consumer_key=api_key,
+            consumer_secret=api_secret,
+            access_token=access_token,
+            access_token_secret=access_secret
+        )
+
+    def create_tweet(self, text: str, in_reply_to_tweet_id: Optional[str] = None) -> Optional[str]:
+        try:
+            if in_reply_to_tweet_id:
+                response = self.client.create_tweet(text=text, in_reply_to_tweet_id=in_reply_to_tweet_id)
+            else:
+                response = self.client.create_tweet(text=text)
+        except self.errors.TooManyRequests as e:
+            reset = e.response.headers.get("x-rate-limit-reset") if e.response is not None else None
+            raise RateLimitError(str(e), reset_at=float(reset) if reset else None) from e
+        except self.errors.Forbidden as e:
+            if "duplicate" in str(e).lower():
+                raise DuplicateTweetError(str(e)) from e
+            raise ForbiddenError(str(e)) from e
+
+        if response and response.data:
+            return response.data['id']
+        return None
+
+    def get_username(self) -> Optional[str]:
+        me = self.client.get_me()
+        if me and me.data:
+            return me.data.username
+        return None
+
+
 class TwitterPoster:
-    def __init__(self):
-        """Initialize Twitter API connection using environment variables"""
-        self.api = None
-        self.client = None
-        self.connected = False
+    def __init__(self, backend: Optional[TwitterBackend] = None):
+        """
+        Set up posting through the environment's Twitter credentials, or an
+        explicit backend
+        
+        Nothing is imported or sent over the network until the first post
+        (or the first look at `connected`).
+        """
+        self.backend = backend
+        self._connected = None
+    
+    @property
+    def connected(self) -> bool:
+        """Whether posting can work; checked once, on first use"""
+        if self._connected is None:
+            self._connected = self._connect()
+        return self._connected
+    
+    def recheck(self):
+        """Forget a failed connection check, so the next use tries again"""
+        if self._connected is False:
+            self._connected = None
+    
+    def _connect(self) -> bool:
+        """Build the backend if needed and verify credentials"""
+        if self.backend is not None:
+            return bool(self.verify_credentials())
         
         # Load from .local.env if it exists
         self._load_local_env()
@@ -28,50 +135,56 @@ class TwitterPoster:
         if all([api_key, api_secret, access_token, access_secret]):
             try:
                 # Twitter API v2 (for posting)
-                self.client = tweepy.Client(
-                    consumer_key=api_key,
-                    consumer_secret=api_secret,
-                    access_token=access_token,
-                    access_token_secret=access_secret
-                )
+                self.backend = TweepyBackend(api_key, api_secret, access_token, access_secret)
                 
                 # Verify credentials work
                 self.verify_credentials()
-                self.connected = True
                 print("✓ Twitter API connected successfully")
+                return True
                 
             except Exception as e:
                 print(f"⚠ Twitter API connection failed: {e}")
-                self.connected = False
+                return False
         else:
             print("⚠ Twitter API credentials not found in environment")
-            self.connected = False
+            return False
     
     def _load_local_env(self):
-        """Load environment variables from .env.local file if it exists"""
-        env_file = Path(__file__).parent / '.env.local'
-        if env_file.exists():
-            with open(env_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        # Only set if not already in environment (GitHub secrets take precedence)
-                        if key not in os.environ:
-                            os.environ[key] = value
+        load_local_env()
     
     def verify_credentials(self):
         """Verify that we can connect to Twitter"""
         try:
             # Try to get authenticated user info
-            me = self.client.get_me()
-            if me and me.data:
-                print(f"Authenticated as: @{me.data.username}")
+            username = self.backend.get_username()
+            if username:
+                print(f"Authenticated as: @{username}")
                 return True
         except Exception as e:
             print(f"Credential verification failed: {e}")
             return False
     
+    def send(self, text: str, in_reply_to_tweet_id: Optional[str] = None,
+             key: Optional[str] = None) -> Optional[str]:
+        """
+        Post a tweet and let failures propagate
+        
+        Unlike post_tweet, RateLimitError / ForbiddenError / network errors
+        are raised so a caller (such as the outbox) can decide to retry.
+        key (the commit hash) lets other platforms deduplicate retries;
+        Twitter already rejects a repeated tweet.
+        """
+        if not self.connected:
+            raise RuntimeError("Twitter API not connected")
+        
+        if len(text) > 280:
+            print(f"Warning: Tweet too long ({len(text)} chars), truncating...")
+            text = text[:277] + "..."
+        
+        METRICS.incr("api_requests")
+        with METRICS.stage("api"):
+            return self.backend.create_tweet(text, in_reply_to_tweet_id=in_reply_to_tweet_id)
+    
     def post_tweet(self, text: str) -> Optional[str]:
         """
         Post a tweet and return the tweet ID if successful
@@ -86,25 +199,20 @@ class TwitterPoster:
             print("Cannot post: Twitter API not connected")
             return None
         
-        if len(text) > 280:
-            print(f"Warning: Tweet too long ({len(text)} chars), truncating...")
-            text = text[:277] + "..."
-        
         try:
-            response = self.client.create_tweet(text=text)
+            tweet_id = self.send(text)
             
-            if response and response.data:
-                tweet_id = response.data['id']
+            if tweet_id:
                 print(f"✓ Tweet posted successfully: ID {tweet_id}")
                 return tweet_id
             else:
                 print("⚠ Tweet may have failed: No response data")
                 return None
                 
-        except tweepy.errors.TooManyRequests:
+        except RateLimitError:
             print("⚠ Rate limit exceeded. Try again later.")
             return None
-        except tweepy.errors.Forbidden as e:
+        except ForbiddenError as e:
             print(f"⚠ Forbidden: {e}")
             print("This might mean duplicate tweet or suspended account")
             return None
@@ -122,25 +230,18 @@ class TwitterPoster:
         Returns:
             True if all tweets posted successfully
         """
-        if not tweets:
+        if not tweets or not self.connected:
             return False
         
         last_tweet_id = None
         
         for i, tweet_text in enumerate(tweets):
             try:
-                if last_tweet_id:
-                    # Reply to previous tweet in thread
-                    response = self.client.create_tweet(
-                        text=tweet_text,
-                        in_reply_to_tweet_id=last_tweet_id
-                    )
-                else:
-                    # First tweet in thread
-                    response = self.client.create_tweet(text=tweet_text)
+                # The first tweet starts the thread, the rest reply to the previous one
+                tweet_id = self.backend.create_tweet(tweet_text, in_reply_to_tweet_id=last_tweet_id)
                 
-                if response and response.data:
-                    last_tweet_id = response.data['id']
+                if tweet_id:
+                    last_tweet_id = tweet_id
                     print(f"✓ Thread tweet {i+1}/{len(tweets)} posted")
                 else:
                     print(f"⚠ Thread tweet {i+1} may have failed")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Watcher for Erosion Broadcaster
+Long-running alternative to the cron schedule: keeps the clone, git pipes,
+caches and Twitter client warm, polls the remote with `git ls-remote` and
+broadcasts as soon as new erosion commits land.
+"""
+
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from metrics import METRICS
+
+
+class Watcher:
+    def __init__(self, broadcaster, interval: float = 300.0, trigger_file=None,
+                 dry_run: bool = True, metrics_textfile=None, tick: float = 1.0):
+        """
+        Args:
+            broadcaster: ErosionBroadcaster to keep warm and run on every change
+            interval: Seconds between `git ls-remote` polls
+            trigger_file: Path whose appearance forces a run right away;
+                it is removed once noticed
+            dry_run: Print tweets instead of posting them
+            metrics_textfile: Prometheus textfile rewritten with each poll's numbers
+            tick: How often the trigger file and stop signal are checked
+        """
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self.trigger_file = Path(trigger_file) if trigger_file else None
+        self.dry_run = dry_run
+        self.metrics_textfile = metrics_textfile
+        self.tick = tick
+
+        self.stopping = threading.Event()
+        self._wake = threading.Event()
+        # Remote tip as of the last successful run; None runs the first cycle at once
+        self.seen_head = None
+        self.cycles = 0
+
+    def install_signal_handlers(self):
+        """SIGTERM/SIGINT stop after the current cycle; SIGUSR1 runs a cycle now"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda *_: self._wake.set())
+
+    def stop(self, *_):
+        self.stopping.set()
+
+    def remote_head(self) -> Optional[str]:
+        """The remote's HEAD commit, without fetching anything"""
+        METRICS.incr("subprocess_calls")
+        try:
+            result = subprocess.run(["git", "ls-remote", self.broadcaster.erosion_repo, "HEAD"],
+                                    capture_output=True, text=True, timeout=60)
+        except subprocess.TimeoutExpired:
+            return None
+        fields = result.stdout.split()
+        return fields[0] if result.returncode == 0 and fields else None
+
+    def triggered(self) -> bool:
+        """True (once) if the trigger file appeared or SIGUSR1 arrived"""
+        if self._wake.is_set():
+            self._wake.clear()
+            return True
+        if self.trigger_file is not None and self.trigger_file.exists():
+            self.trigger_file.unlink(missing_ok=True)
+            return True
+        return False
+
+    def recheck_connections(self):
+        """A destination that failed to connect (bad network, expired token) gets another try"""
+        for destination in self.broadcaster.get_publisher().destinations:
+            recheck = getattr(destination.poster, "recheck", None)
+            if recheck is not None:
+                recheck()
+
+    def run_once(self, force: bool = False) -> bool:
+        """
+        Broadcast if the remote moved (or force), then drain the outbox;
+        returns True if new commits were analysed
+        """
+        # Each poll is one run as far as the exported "last run" gauges go
+        METRICS.reset()
+        head = self.remote_head()
+        if head is None and not force:
+            print("⚠ Couldn't reach the erosion remote, trying again next poll")
+            METRICS.incr("watch_errors")
+            return False
+
+        changed = force or head != self.seen_head
+        try:
+            if changed:
+                # Analyse and queue only; posting happens below, interruptibly
+                self.broadcaster.broadcast(dry_run=self.dry_run, flush=False)
+                self.seen_head = head
+                self.cycles += 1
+                METRICS.incr("watch_cycles")
+            if not self.dry_run and self.broadcaster.twitter is not None:
+                self.recheck_connections()
+                # Also retries tweets an earlier cycle left queued
+                self.broadcaster.flush_outbox(stop=self.stopping)
+        except Exception as e:
+            # A daemon outlives one bad cycle; seen_head is unchanged, so it is retried
+            print(f"⚠ Watch cycle failed: {e}")
+            METRICS.incr("watch_errors")
+            return False
+        finally:
+            if self.metrics_textfile:
+                METRICS.write_prometheus(self.metrics_textfile, mode="watch")
+        return changed
+
+    def wait(self) -> bool:
+        """Sleep until the next poll; True if woken early by a trigger"""
+        deadline = time.monotonic() + self.interval
+        while not self.stopping.is_set():
+            if self.triggered():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.stopping.wait(min(self.tick, remaining))
+        return False
+
+    def run(self, max_cycles: Optional[int] = None):
+        """Poll until stopped (or max_cycles polls), then shut down cleanly"""
+        print(f"[Watcher] Polling {self.broadcaster.erosion_repo} every {self.interval:.0f}s"
+              + (f", trigger file {self.trigger_file}" if self.trigger_file else ""))
+        polls = 0
+        force = False
+        try:
+            while not self.stopping.is_set():
+                self.run_once(force=force)
+                polls += 1
+                if max_cycles is not None and polls >= max_cycles:
+                    break
+                force = self.wait()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Persist everything and release the warm resources"""
+        broadcaster = self.broadcaster
+        broadcaster.save_state()
+        broadcaster.snippet_cache.save()
+        for outbox in broadcaster.get_publisher().outboxes.values():
+            outbox.compact()
+        broadcaster.git.close()
+        broadcaster.index.close()
+        print(f"✓ Watcher stopped after {self.cycles} broadcast cycle(s), state saved")